@@ -0,0 +1,134 @@
+"""
+Fixed-concurrency load generator: every virtual user is an asyncio task that sends requests one after another
+for given time. Requests go through requests.Session in thread pool, so cookies, CSRF and redirects work as in browser.
+
+    python -m benchmarks.load http://127.0.0.1:8000 --scenario index --concurrency 20 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .stub_server import STUB_CITIES
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark-pass-123'
+
+
+def percentile(values, percent): # Nearest-rank percentile of list of numbers
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def login(session, base_url, username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD): # Log in the way browser does: get form with CSRF cookie, then post it
+    session.get(f'{base_url}/login/')
+    return session.post(f'{base_url}/login/', allow_redirects=False, data={
+        'username': username,
+        'password': password,
+        'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+    })
+
+
+class IndexScenario: # Anonymous first visit: city comes from IP geolocation
+    name = 'index'
+    expected_status = 200
+
+    def __init__(self, base_url, rng):
+        self.base_url = base_url
+        self.rng = rng
+
+    def setup(self):
+        pass
+
+    def run(self):
+        ip = f'93.184.{self.rng.randint(0, 15)}.{self.rng.randint(1, 254)}'
+        return requests.get(f'{self.base_url}/', headers={'X-Forwarded-For': ip})
+
+
+class FavoritesScenario(IndexScenario): # Logged in user switches between favorite cities
+    name = 'favorites'
+
+    def setup(self):
+        self.session = requests.Session()
+        login(self.session, self.base_url)
+
+    def run(self):
+        city = self.rng.choice(list(STUB_CITIES))
+        return self.session.get(f'{self.base_url}/show_favorites/', params={'city': city})
+
+
+class LoginScenario(IndexScenario): # Full login: login page with form, then form submit
+    name = 'login'
+    expected_status = 302
+
+    def run(self):
+        return login(requests.Session(), self.base_url)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [IndexScenario, FavoritesScenario, LoginScenario]}
+
+
+async def run_virtual_user(scenario, executor, deadline, latencies, errors):
+    loop = asyncio.get_running_loop()
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await loop.run_in_executor(executor, scenario.run)
+            failed = response.status_code != scenario.expected_status
+        except requests.RequestException:
+            failed = True
+        latencies.append((time.perf_counter() - started) * 1000)
+        if failed:
+            errors.append(1)
+
+
+async def run_load_async(base_url, scenario_name, concurrency, duration, seed):
+    latencies, errors = [], []
+    scenarios = [SCENARIOS[scenario_name](base_url, random.Random(seed + index)) for index in range(concurrency)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(executor, scenario.setup) for scenario in scenarios]) # Log in before measuring
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[run_virtual_user(scenario, executor, deadline, latencies, errors) for scenario in scenarios])
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50': round(percentile(latencies, 50), 2),
+        'p95': round(percentile(latencies, 95), 2),
+        'p99': round(percentile(latencies, 99), 2),
+    }
+
+
+def run_load(base_url, scenario_name, concurrency=10, duration=10.0, seed=0): # Run one scenario, return throughput and latency percentiles in ms
+    return asyncio.run(run_load_async(base_url.rstrip('/'), scenario_name, concurrency, duration, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fixed-concurrency load generator for Pogoyda')
+    parser.add_argument('base_url')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='index')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(run_load(args.base_url, args.scenario, args.concurrency, args.duration, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Reproducible benchmark: starts local weatherapi.com/ipinfo.io stub, starts Django against it, drives every scenario
+with fixed concurrency and compares results with stored baseline of previous commit.
+
+    python -m benchmarks.run --latency 80 --concurrency 20 --duration 20 --save-baseline
+    python -m benchmarks.run --server gunicorn --against runserver
+    python -m benchmarks.run --record && python -m benchmarks.run --replay
+
+Baselines are stored in benchmarks/baselines/<commit>-<server>.json. Every run is compared with the newest baseline
+of the same server from another commit, or with baseline of another server (--against). Exit code is 1 if p95 latency
+grows or throughput drops by more than --max-regression percent.
+"""
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+from .load import BENCHMARK_PASSWORD, BENCHMARK_USERNAME, SCENARIOS, run_load
+from .stub_server import start_stub_server
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BASELINES_DIR = Path(__file__).resolve().parent / 'baselines'
+
+PREPARE_SCRIPT = f'''
+from django.core.cache import cache
+from pogoyda_weather_app.models import CustomUser
+cache.clear()
+if not CustomUser.objects.filter(username={BENCHMARK_USERNAME!r}).exists():
+    CustomUser.objects.create_user(username={BENCHMARK_USERNAME!r}, email='benchmark@example.com', password={BENCHMARK_PASSWORD!r})
+'''
+
+
+SERVER_COMMANDS = {
+    'runserver': '{python} manage.py runserver --noreload 127.0.0.1:{port}',
+    'gunicorn': '{python} -m gunicorn -c gunicorn.conf.py --bind 127.0.0.1:{port}',
+    'uvicorn': '{python} -m gunicorn -c gunicorn.conf.py --bind 127.0.0.1:{port}',
+}
+
+SERVER_ENV = {
+    'uvicorn': {'GUNICORN_WORKER_CLASS': 'uvicorn'},
+}
+
+
+def get_commit(): # Short hash of current commit, baselines are stored per commit
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or 'unknown'
+
+
+def manage(env, *args): # Run manage.py command in environment of benchmarked server
+    subprocess.run([sys.executable, 'manage.py', *args], cwd=BASE_DIR, env=env, check=True)
+
+
+def wait_for_server(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            if requests.get(f'{base_url}/login/', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f'Server did not start in {timeout} seconds')
+
+
+def find_baseline(commit, server, baseline=None, against=None): # Explicitly given baseline, another server on this commit or the newest one of this server
+    if baseline:
+        return BASELINES_DIR / f'{baseline}-{against or server}.json'
+    if against:
+        return BASELINES_DIR / f'{commit}-{against}.json'
+    baselines = sorted((path for path in BASELINES_DIR.glob(f'*-{server}.json') if path.stem != f'{commit}-{server}'),
+                       key=lambda path: path.stat().st_mtime)
+    return baselines[-1] if baselines else None
+
+
+def compare_with_baseline(results, baseline_results, max_regression): # Return list of regressions as readable strings
+    regressions = []
+    for scenario, result in results.items():
+        previous = baseline_results.get(scenario)
+        if not previous:
+            continue
+        if previous['p95'] and result['p95'] > previous['p95'] * (1 + max_regression / 100):
+            regressions.append(f'{scenario}: p95 {previous["p95"]} ms -> {result["p95"]} ms')
+        if result['throughput'] < previous['throughput'] * (1 - max_regression / 100):
+            regressions.append(f'{scenario}: throughput {previous["throughput"]} -> {result["throughput"]} req/s')
+    return regressions
+
+
+def print_report(results):
+    print(f'{"scenario":<12}{"req/s":>10}{"p50, ms":>10}{"p95, ms":>10}{"p99, ms":>10}{"errors":>8}  upstream calls')
+    for scenario, result in results.items():
+        print(f'{scenario:<12}{result["throughput"]:>10}{result["p50"]:>10}{result["p95"]:>10}{result["p99"]:>10}'
+              f'{result["errors"]:>8}  {result["upstream_calls"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Pogoyda against local upstream stub')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per scenario')
+    parser.add_argument('--latency', type=float, default=80.0, help='stub upstream latency, ms')
+    parser.add_argument('--jitter', type=float, default=20.0, help='stub latency spread, ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of failing forecast requests, 0..1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--server', choices=SERVER_COMMANDS, default='runserver')
+    parser.add_argument('--server-cmd', help='custom command that starts server, {port} and {python} are substituted')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as baseline of current commit')
+    parser.add_argument('--baseline', help='commit of baseline to compare with, default is the newest one')
+    parser.add_argument('--against', choices=SERVER_COMMANDS, help='compare with baseline of another server')
+    parser.add_argument('--max-regression', type=float, default=15.0, help='allowed regression, percent')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', action='store_true', help='capture forecasts of the stub to benchmarks/recordings')
+    parser.add_argument('--replay', action='store_true', help='serve forecasts from benchmarks/recordings instead of the stub')
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    stub_url = f'http://127.0.0.1:{stub.server_address[1]}'
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    env = dict(os.environ,
+               WEATHERAPI_REQUESTS_LINK=f'{stub_url}/v1/forecast.json',
+               IPINFO_REQUESTS_LINK=f'{stub_url}/ipinfo',
+               RATELIMIT_ENABLE='False', # All virtual users come from one address
+               DEBUG='False',
+               WEATHER_PROVIDERS='replay' if args.replay else 'weatherapi',
+               WEATHER_RECORD=str(args.record),
+               **SERVER_ENV.get(args.server, {}))
+    manage(env, 'migrate', '--verbosity', '0')
+    manage(env, 'collectstatic', '--noinput', '--verbosity', '0')
+    manage(env, 'shell', '--command', PREPARE_SCRIPT)
+
+    server_cmd = (args.server_cmd or SERVER_COMMANDS[args.server]).format(port=args.port, python=shlex.quote(sys.executable))
+    server = subprocess.Popen(shlex.split(server_cmd), cwd=BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_for_server(base_url, server)
+        for scenario in args.scenarios:
+            requests.get(f'{stub_url}/__reset')
+            results[scenario] = run_load(base_url, scenario, args.concurrency, args.duration, args.seed)
+            results[scenario]['upstream_calls'] = requests.get(f'{stub_url}/__stats').json()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        stub.shutdown()
+
+    print_report(results)
+
+    commit = get_commit()
+    report = {
+        'commit': commit,
+        'server': args.server,
+        'settings': {'concurrency': args.concurrency, 'duration': args.duration, 'latency': args.latency,
+                     'jitter': args.jitter, 'error_rate': args.error_rate},
+        'results': results,
+    }
+
+    exit_code = 0
+    baseline_path = find_baseline(commit, args.server, args.baseline, args.against)
+    if baseline_path and baseline_path.exists():
+        regressions = compare_with_baseline(results, json.loads(baseline_path.read_text())['results'], args.max_regression)
+        print(f'\nCompared with baseline {baseline_path.stem}: ' + ('no regressions' if not regressions else 'REGRESSIONS'))
+        for regression in regressions:
+            print(f'  {regression}')
+        exit_code = 1 if regressions else 0
+
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        (BASELINES_DIR / f'{commit}-{args.server}.json').write_text(json.dumps(report, indent=2))
+        print(f'Baseline saved to benchmarks/baselines/{commit}-{args.server}.json')
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Local stub of weatherapi.com and ipinfo.io for benchmarks and offline runs.
+
+    python -m benchmarks.stub_server --port 8081 --latency 80 --jitter 20 --error-rate 0.01
+
+Endpoints:
+    /v1/forecast.json?q=<city>&days=<n>   forecast in weatherapi.com format, unknown cities get error 1006
+    /ipinfo/<ip>/json                    city for IP (same IP always gets same city)
+    /__stats                             number of upstream calls by endpoint, as JSON
+    /__reset                             reset counters
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pogoyda_weather_app.sample_data import SAMPLE_CITIES, make_forecast_response
+
+STUB_CITIES = SAMPLE_CITIES # Stub knows these cities, other queries are answered with 'No matching location found'
+
+
+class StubState: # Settings and counters shared by all request threads
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def count(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def wait(self): # Emulate network and upstream processing time
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            failed = self.random.random() < self.error_rate
+        time.sleep(delay / 1000)
+        return failed
+
+
+def find_stub_city(query): # Case-insensitive match of query with known city
+    for city, details in STUB_CITIES.items():
+        if city.lower() == query.strip().lower():
+            return city, details
+    return None, None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/__stats':
+            with self.state.lock:
+                return self.send_json(200, dict(self.state.calls))
+        if url.path == '/__reset':
+            with self.state.lock:
+                self.state.calls.clear()
+            return self.send_json(200, {})
+
+        if url.path == '/v1/forecast.json':
+            self.state.count('forecast')
+            if self.state.wait():
+                return self.send_json(500, {'error': {'code': 9999, 'message': 'Internal application error.'}})
+
+            city, details = find_stub_city(query.get('q', [''])[0])
+            if city is None:
+                return self.send_json(400, {'error': {'code': 1006, 'message': 'No matching location found.'}})
+
+            region, country, lat, lon = details
+            days = int(query.get('days', ['3'])[0])
+            updated_at = int(time.time()) // 900 * 900 # weatherapi.com updates current weather every 15 minutes
+            return self.send_json(200, make_forecast_response(city, region, country, lat, lon, days, updated_at))
+
+        if url.path.startswith('/ipinfo/') and url.path.endswith('/json'):
+            self.state.count('ipinfo')
+            self.state.wait()
+            ip = url.path.split('/')[2]
+            city = list(STUB_CITIES)[zlib.crc32(ip.encode()) % len(STUB_CITIES)]
+            return self.send_json(200, {'ip': ip, 'city': city, 'country': STUB_CITIES[city][1]})
+
+        self.send_json(404, {'error': 'not found'})
+
+    def log_message(self, format, *args): # Don't print every request, benchmarks send thousands of them
+        pass
+
+
+def make_stub_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+    handler = type('BoundStubHandler', (StubHandler,), {'state': StubState(latency, jitter, error_rate, seed)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stub_server(**kwargs): # Run stub in background thread, return server with real port in server.server_address
+    server = make_stub_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of weatherapi.com and ipinfo.io')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='average upstream latency, ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='latency spread, ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of forecast requests that fail, 0..1')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_stub_server(args.host, args.port, args.latency, args.jitter, args.error_rate, args.seed)
+    print(f'Stub server listening on http://{args.host}:{server.server_address[1]}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
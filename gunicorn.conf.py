@@ -0,0 +1,54 @@
+# Production server profile: gunicorn -c gunicorn.conf.py
+#
+# GUNICORN_WORKER_CLASS=gthread (default) serves WSGI app with threads, =uvicorn serves ASGI app with uvicorn workers.
+# Worker and thread counts are derived from CPU count and can be overridden with GUNICORN_WORKERS / GUNICORN_THREADS.
+#
+# Graceful reload of workers (new settings, memory cleanup): kill -HUP <master pid>.
+# App is preloaded in master, so new code needs zero-downtime upgrade: kill -USR2 <master pid>, then -QUIT to old master.
+
+import multiprocessing
+import os
+import shutil
+
+cpu_count = multiprocessing.cpu_count()
+server_mode = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+if server_mode == 'uvicorn': # Event loop per worker, one worker per CPU is enough
+    wsgi_app = 'pogoyda_weather.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = int(os.getenv('GUNICORN_WORKERS', cpu_count))
+    threads = 1
+else: # Views mostly wait for Redis and weather API, so threads let one worker serve several requests at once
+    wsgi_app = 'pogoyda_weather.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.getenv('GUNICORN_WORKERS', cpu_count + 1))
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+preload_app = True # Django and pymorphy3 dictionaries are loaded once in master and shared with workers by fork
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000)) # Recycle workers to keep memory bounded
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200)) # So workers don't restart all at once
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+
+# Metrics of all workers are aggregated through files in this directory, see pogoyda_weather_app/metrics.py.
+# Prepared when config is read: preload_app imports the app before on_starting, and metrics open their files on import
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/pogoyda_metrics')
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True) # Metrics of previous run
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def when_ready(server): # App is already loaded in master, import views and URLs too so workers get them ready after fork
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    import pogoyda_weather_app.views # Loads pymorphy3 dictionaries
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
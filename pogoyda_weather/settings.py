@@ -29,6 +29,51 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # API KEY FOR weatherapi.com AND LINK FOR REQUESTS
 WEATHERAPI_KEY = os.getenv('WEATHERAPI_KEY')
 WEATHERAPI_REQUESTS_LINK = os.getenv('WEATHERAPI_REQUESTS_LINK')
+FORECAST_MAX_DAYS = int(os.getenv('FORECAST_MAX_DAYS', 3)) # Longest forecast horizon, free weatherapi.com plan gives 3 days
+
+# WEATHER PROVIDERS, see pogoyda_weather_app/providers.py: first one is primary, next ones are used when it fails
+WEATHER_PROVIDERS = os.getenv('WEATHER_PROVIDERS', 'weatherapi').split(',') # weatherapi, open_meteo, replay
+WEATHER_PROVIDER_TIMEOUT = 10
+WEATHER_PROVIDER_FAILOVER_TIMEOUT = float(os.getenv('WEATHER_PROVIDER_FAILOVER_TIMEOUT', 3)) # Primary is considered slow after it
+OPEN_METEO_FORECAST_LINK = os.getenv('OPEN_METEO_FORECAST_LINK', 'https://api.open-meteo.com/v1/forecast')
+OPEN_METEO_GEOCODING_LINK = os.getenv('OPEN_METEO_GEOCODING_LINK', 'https://geocoding-api.open-meteo.com/v1/search')
+WEATHER_REPLAY_DIR = Path(os.getenv('WEATHER_REPLAY_DIR', BASE_DIR / 'benchmarks' / 'recordings')) # Captured responses for replay provider
+WEATHER_RECORD = os.getenv('WEATHER_RECORD', 'False').lower() == 'true' # Write every provider response to WEATHER_REPLAY_DIR
+
+# WEATHER ALERTS on favorite cities, `python manage.py evaluate_weather_alerts` from cron every few minutes
+WEATHER_ALERTS_HORIZON_HOURS = int(os.getenv('WEATHER_ALERTS_HORIZON_HOURS', 24)) # Forecast hours rules are checked against
+WEATHER_ALERTS_COOLDOWN = int(os.getenv('WEATHER_ALERTS_COOLDOWN', 12 * 3600)) # Fired rule is silent for this many seconds
+WEATHER_ALERTS_FETCH_WORKERS = int(os.getenv('WEATHER_ALERTS_FETCH_WORKERS', 16)) # Cities fetched concurrently
+WEATHER_ALERTS_EMAIL_BATCH = 100 # Emails sent per send_messages() call of one SMTP connection
+
+# MORNING FORECAST DIGEST, `python manage.py send_forecast_digest` from cron
+FORECAST_DIGEST_CHUNK_SIZE = int(os.getenv('FORECAST_DIGEST_CHUNK_SIZE', 200)) # Users loaded and emails sent at once
+
+# LIVE UPDATES of current weather over Server-Sent Events, served only by ASGI app (GUNICORN_WORKER_CLASS=uvicorn)
+LIVE_REFRESH_INTERVAL = int(os.getenv('LIVE_REFRESH_INTERVAL', 10)) # How often one of processes checks cache entry of watched city
+LIVE_KEEPALIVE_INTERVAL = 15 # Seconds between comment lines on idle stream
+LIVE_QUEUE_SIZE = 1 # Updates waiting for slow client, each one has whole current weather, so only newest matters
+
+# PROFILING of single requests, see pogoyda_weather_app/profiling.py. Profiles are listed and merged by `python manage.py profiles`
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0)) # Share of requests profiled, e.g. 0.001
+PROFILER_TOKEN = os.getenv('PROFILER_TOKEN', '') # Request with `X-Profile: <token>` header is always profiled, empty disables header
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.005)) # Seconds between stack samples
+PROFILER_DIR = Path(os.getenv('PROFILER_DIR', BASE_DIR / 'profiles'))
+PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 200)) # The oldest profiles are deleted over this number
+
+# STREAMED MAIN PAGE: when forecast isn't cached, page shell is sent at once and forecast section follows when weather API answers
+INDEX_STREAMING = os.getenv('INDEX_STREAMING', 'False').lower() == 'true'
+
+# Cities in one geohash cell share cached forecast, 0 disables sharing. Precision 5 is a ~5x5 km cell, 4 is ~39x20 km
+WEATHER_GEOHASH_PRECISION = int(os.getenv('WEATHER_GEOHASH_PRECISION', 0))
+
+# FORECAST HISTORY: fetched weather is stored in database, see pogoyda_weather_app/history.py
+FORECAST_HISTORY_ENABLED = os.getenv('FORECAST_HISTORY_ENABLED', 'False').lower() == 'true'
+FORECAST_HISTORY_DOWNSAMPLE_DAYS = int(os.getenv('FORECAST_HISTORY_DOWNSAMPLE_DAYS', 14)) # Older hourly data is kept as daily averages
+FORECAST_HISTORY_RETENTION_DAYS = int(os.getenv('FORECAST_HISTORY_RETENTION_DAYS', 365))
+
+# LINK FOR IP GEOLOCATION REQUESTS (ipinfo.io)
+IPINFO_REQUESTS_LINK = os.getenv('IPINFO_REQUESTS_LINK', 'https://ipinfo.io')
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'False').lower()=='true'
@@ -40,6 +85,15 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS').split(',')
 AUTH_USER_MODEL = 'pogoyda_weather_app.CustomUser'
 
 RATELIMIT_VIEW = 'pogoyda_weather_app.views.redirect_too_many_requests'
+RATELIMIT_ENABLE = os.getenv('RATELIMIT_ENABLE', 'True').lower()=='true' # Disabled only for load tests from one address
+RATELIMIT_FAIL_OPEN = True # If request can't be counted, let it through instead of rejecting every request
+# django-ratelimit knows only Django's own cache classes. ResilientRedisCache is RedisCache with atomic INCR, and while Redis
+# is down its fallback counts in local memory, the same as LocMemCache the library accepts
+SILENCED_SYSTEM_CHECKS = ['django_ratelimit.W001']
+
+# PROMETHEUS METRICS, /metrics is available only from these addresses (empty list allows everyone).
+# For several workers set PROMETHEUS_MULTIPROC_DIR environment variable to empty directory shared by them.
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',') if ip]
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -53,7 +107,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pogoyda_weather_app.middleware.MetricsMiddleware',
+    'pogoyda_weather_app.profiling.ProfilerMiddleware', # Removed from chain when profiling is off
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'pogoyda_weather_app.redis_batch.RedisBatchMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,11 +124,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'pogoyda_weather.urls'
 
+# Templates are compiled once per process by cached loader, set TEMPLATES_CACHED_LOADER=False to reparse them on every render
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+if os.getenv('TEMPLATES_CACHED_LOADER', 'True').lower()=='true':
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
+        'APP_DIRS': False,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -78,6 +145,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
@@ -159,10 +227,31 @@ DEFAULT_FROM_EMAIL = os.getenv('GMAIL_SMTP_DEFAULT_FROM_EMAIL', '<EMAIL>')
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
 STATICFILES_DIRS = [
    os.path.join(BASE_DIR, "pogoyda_weather_app/static"),
 ]
 
+# Weather condition icons are mirrored from weatherapi.com CDN into static files by `manage.py mirror_condition_icons`
+# (run before collectstatic), pages then serve them with hashed names. Icons that weren't mirrored are loaded from CDN
+CONDITION_ICONS_ROOT = STATICFILES_DIRS[0]
+WEATHER_CONDITIONS_LINK = os.getenv('WEATHER_CONDITIONS_LINK', 'https://www.weatherapi.com/docs/weather_conditions.json')
+
+# In production collectstatic minifies CSS/JS, adds content hash to file names and pre-compresses them (gzip and brotli),
+# WhiteNoise serves these files from Django process with far-future cache headers. Development serves files as they are.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'pogoyda_weather_app.storage.MinifiedCompressedManifestStaticFilesStorage',
+    },
+}
+
+WHITENOISE_MAX_AGE = 3600 # For files without hash in name (favicon.ico requested by browser directly), hashed files are cached forever
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -170,9 +259,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # SETTING FOR CACHE
 
+REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379')
+
+# Connection pool of every Redis client. Short timeouts: when Redis restarts, requests switch to local cache instead of hanging.
+# redis-py parses replies with hiredis automatically when `hiredis` package is installed
+REDIS_POOL_OPTIONS = {
+    'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+    'socket_connect_timeout': float(os.getenv('REDIS_CONNECT_TIMEOUT', 0.5)),
+    'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.5)),
+    'health_check_interval': int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)), # PING connections idle for longer before use
+}
+
+# While Redis is unreachable, cache is served by in-process LocMemCache of this size, so rate limits are counted per process.
+# Redis is tried again after backoff that doubles with every failure
+REDIS_FALLBACK_MAX_ENTRIES = int(os.getenv('REDIS_FALLBACK_MAX_ENTRIES', 1000))
+REDIS_RETRY_BACKOFF = float(os.getenv('REDIS_RETRY_BACKOFF', 1))
+REDIS_RETRY_MAX_BACKOFF = float(os.getenv('REDIS_RETRY_MAX_BACKOFF', 30))
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379'),
+        'BACKEND': 'pogoyda_weather_app.cache_backend.ResilientRedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'serializer': 'pogoyda_weather_app.cache_serializer.CompactSerializer',
+            **REDIS_POOL_OPTIONS,
+        },
     }
 }
+
+# Cache values are stored as orjson, values longer than CACHE_COMPRESS_MIN_SIZE bytes are compressed: zlib, zstd or lz4
+# (zstd and lz4 need zstandard / lz4 package, without it zlib is used). To switch from Django's pickle serializer without
+# errors in old processes, deploy with CACHE_SERIALIZER_WRITE_FORMAT=pickle first, then with compact.
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'zlib')
+CACHE_COMPRESS_MIN_SIZE = int(os.getenv('CACHE_COMPRESS_MIN_SIZE', 1024))
+CACHE_SERIALIZER_WRITE_FORMAT = os.getenv('CACHE_SERIALIZER_WRITE_FORMAT', 'compact')
+
+# Cities that weather API didn't find are kept in Bloom filter instead of cache key per query, see unknown_cities.py
+UNKNOWN_CITIES_PERIOD = 3600 # Unknown query is not sent to weather API again for 1-2 hours
+UNKNOWN_CITIES_CAPACITY = 100000 # Distinct unknown queries per period, ~180 KB of Redis memory
+UNKNOWN_CITIES_ERROR_RATE = 0.001
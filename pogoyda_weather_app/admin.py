@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, FavoriteLocation
+from .models import CustomUser, FavoriteLocation, ForecastObservation, WeatherAlert
 
 admin.site.register(CustomUser)
 admin.site.register(FavoriteLocation)
+admin.site.register(ForecastObservation)
+admin.site.register(WeatherAlert)
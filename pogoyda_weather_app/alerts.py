@@ -0,0 +1,112 @@
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import WeatherAlert
+from .weather_cache import get_weather_from_cache
+
+# Weather API condition codes of rain, drizzle, showers and thunderstorm with rain
+RAIN_CODES = frozenset({1063, 1087, 1150, 1153, 1168, 1171, 1180, 1183, 1186, 1189, 1192, 1195, 1198, 1201, 1240, 1243, 1246, 1273, 1276})
+
+
+def summarize_forecast(weather_data, hours): # One pass over current weather and next `hours` of forecast, every rule of the city is compared with it
+    now = weather_data['current']['last_updated_epoch']
+    upcoming = [weather_data['current']] + [hour_data for day_data in weather_data['forecast']['forecastday'] for hour_data in day_data['hour']
+                                            if now <= hour_data['time_epoch'] < now + hours * 3600]
+    return {
+        'min_temp_c': min(entry['temp_c'] for entry in upcoming),
+        'max_wind_kph': max(entry['wind_kph'] for entry in upcoming),
+        'rain': any(entry['condition']['code'] in RAIN_CODES for entry in upcoming),
+    }
+
+
+class CityRules: # All active rules of one city. Thresholds are sorted, so triggered rules of a metric are one slice found by bisect
+    def __init__(self, city, country):
+        self.city = city
+        self.country = country
+        self.rules = {WeatherAlert.TEMP_BELOW: [], WeatherAlert.WIND_ABOVE: [], WeatherAlert.RAIN: []} # Metric -> (threshold, id, email)
+
+    def add(self, metric, threshold, alert_id, email):
+        self.rules[metric].append((threshold or 0.0, alert_id, email))
+
+    def triggered(self, summary): # Rules matched by forecast summary, as (rule, text of notification)
+        for rules in self.rules.values():
+            rules.sort()
+        temp_rules = self.rules[WeatherAlert.TEMP_BELOW]
+        wind_rules = self.rules[WeatherAlert.WIND_ABOVE]
+        temp_thresholds = [rule[0] for rule in temp_rules]
+        wind_thresholds = [rule[0] for rule in wind_rules]
+
+        # Temperature alert fires when minimum is below threshold, wind alert when maximum is above it
+        for rule in temp_rules[bisect_right(temp_thresholds, summary['min_temp_c']):]:
+            yield rule, f'temperature will drop to {summary["min_temp_c"]:.0f}°C (your alert: below {rule[0]:g}°C)'
+        for rule in wind_rules[:bisect_left(wind_thresholds, summary['max_wind_kph'])]:
+            yield rule, f'wind will reach {summary["max_wind_kph"]:.0f} km/h (your alert: above {rule[0]:g} km/h)'
+        if summary['rain']:
+            for rule in self.rules[WeatherAlert.RAIN]:
+                yield rule, 'rain is expected'
+
+
+def load_rules(now): # Active rules grouped by city with one query, streamed so 100k rules don't become 100k model instances
+    cooldown_over = Q(last_notified_at__isnull=True) | Q(last_notified_at__lt=now - timedelta(seconds=settings.WEATHER_ALERTS_COOLDOWN))
+    rows = (WeatherAlert.objects.filter(cooldown_over)
+            .values_list('id', 'metric', 'threshold', 'favorite__city', 'favorite__country', 'favorite__user__email')
+            .iterator(chunk_size=10000))
+
+    cities = {}
+    for alert_id, metric, threshold, city, country, email in rows:
+        if (city, country) not in cities:
+            cities[city, country] = CityRules(city, country)
+        cities[city, country].add(metric, threshold, alert_id, email)
+    return cities
+
+
+def fetch_summary(city_rules): # Through the same cache as pages, so a city watched by many users costs one lookup
+    try:
+        weather_data = get_weather_from_cache(city_rules.city)
+    finally:
+        connection.close() # Connection of worker thread, opened only when cache miss records forecast history
+    if not isinstance(weather_data, dict): # City not found or weather API error, rules are checked next run
+        return None
+    return summarize_forecast(weather_data, settings.WEATHER_ALERTS_HORIZON_HOURS)
+
+
+def send_notifications(notifications): # email -> list of lines. One email per user, sent over one connection in batches
+    messages = [EmailMessage('Weather alert', 'Weather alerts for your favorite cities:\n\n' + '\n'.join(lines),
+                             settings.DEFAULT_FROM_EMAIL, [email])
+                for email, lines in notifications.items()]
+    batch_size = settings.WEATHER_ALERTS_EMAIL_BATCH
+    sent = 0
+    with get_connection() as mail_connection:
+        for start in range(0, len(messages), batch_size):
+            sent += mail_connection.send_messages(messages[start:start + batch_size]) or 0
+    return sent
+
+
+def evaluate_alerts(): # Check every active rule, notify users and start cooldown of fired rules. Returns counters for report
+    now = timezone.now()
+    cities = load_rules(now)
+    with ThreadPoolExecutor(settings.WEATHER_ALERTS_FETCH_WORKERS) as executor: # Cache misses wait for weather API, fetch cities concurrently
+        summaries = dict(zip(cities, executor.map(fetch_summary, cities.values())))
+
+    notifications = {}
+    fired = []
+    for key, city_rules in cities.items():
+        if summaries[key] is None:
+            continue
+        for (threshold, alert_id, email), text in city_rules.triggered(summaries[key]):
+            notifications.setdefault(email, []).append(f'{city_rules.city}, {city_rules.country}: {text}')
+            fired.append(alert_id)
+
+    sent = send_notifications(notifications) if notifications else 0
+    for start in range(0, len(fired), 1000): # Bounded IN lists
+        WeatherAlert.objects.filter(id__in=fired[start:start + 1000]).update(last_notified_at=now)
+
+    return {'rules': sum(len(rules) for city_rules in cities.values() for rules in city_rules.rules.values()),
+            'cities': len(cities), 'fired': len(fired), 'emails': sent}
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PogoydaWeatherAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pogoyda_weather_app'
+
+    def ready(self):
+        from . import checks # Register startup checks for compiled translation catalogs
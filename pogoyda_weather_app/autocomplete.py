@@ -0,0 +1,149 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from pathlib import Path
+
+from django.core.cache import cache
+
+from .cache_backend import REDIS_ERRORS, get_redis
+
+BUNDLED_CITIES = Path(__file__).resolve().parent / 'data' / 'cities.txt'
+RESOLVED_CITIES_KEY = 'autocomplete_resolved_cities' # Redis set of cities found by weather API, shared by all processes
+RESOLVED_CITIES_LIMIT = 10000
+SYNC_INTERVAL = 60 # Seconds between checks for cities resolved by other processes
+
+
+def normalize_city(text): # Case, accents, ё/е and separators don't matter: "São Paulo" == "sao paulo", "Орёл" == "орел"
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text.casefold()) if not unicodedata.combining(char))
+    return re.sub(r'[\s\-]+', ' ', text).strip()
+
+
+def get_trigrams(name): # Trigrams of normalized name with word boundaries, "kazan" -> {"  k", " ka", "kaz", "aza", "zan", "an "}
+    padded = f'  {name} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def edit_distance(first, second, limit): # Levenshtein distance, stops early and returns limit + 1 when it's exceeded
+    previous = list(range(len(second) + 1))
+    for row, first_char in enumerate(first, 1):
+        current = [row]
+        for column, second_char in enumerate(second, 1):
+            current.append(min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + (first_char != second_char)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CityIndex: # Prefix index: sorted list of (normalized name, city, country), prefix search is bisect + scan
+    def __init__(self, cities=()):
+        self.entries = sorted({(normalize_city(city), city, country) for city, country in cities})
+        self.trigrams = {} # Trigram -> entries with it, candidates for typo correction
+        self.lock = threading.Lock() # Threads of a worker add resolved cities while others search
+        for entry in self.entries:
+            self.add_trigrams(entry)
+
+    def add_trigrams(self, entry):
+        for trigram in get_trigrams(entry[0]):
+            self.trigrams.setdefault(trigram, set()).add(entry)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as cities_file:
+            rows = [line.rstrip('\n').split('\t') for line in cities_file if line.strip() and not line.startswith('#')]
+        return cls((city, country) for city, country in rows)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, city_and_country):
+        city, country = city_and_country
+        entry = (normalize_city(city), city, country)
+        position = bisect_left(self.entries, entry)
+        return position < len(self.entries) and self.entries[position] == entry
+
+    def add(self, city, country): # Returns False if city is already known
+        if (city, country) in self:
+            return False
+        entry = (normalize_city(city), city, country)
+        with self.lock:
+            insort(self.entries, entry)
+            self.add_trigrams(entry)
+        return True
+
+    def contains_name(self, name): # Whether any known city has this name, whatever the country
+        name = normalize_city(name)
+        position = bisect_left(self.entries, (name,))
+        return position < len(self.entries) and self.entries[position][0] == name
+
+    def suggest(self, prefix, limit=10): # Cities whose normalized name starts with normalized prefix, alphabetically
+        prefix = normalize_city(prefix)
+        if not prefix:
+            return []
+
+        suggestions = []
+        for name, city, country in self.entries[bisect_left(self.entries, (prefix,)):]:
+            if not name.startswith(prefix) or len(suggestions) == limit:
+                break
+            suggestions.append({'city': city, 'country': country})
+        return suggestions
+
+    def similar(self, query, limit=3): # "Did you mean": known cities within small edit distance, candidates are found by shared trigrams
+        name = normalize_city(query)
+        if not name:
+            return []
+
+        with self.lock: # Copies, so add() in another thread doesn't change sets during iteration
+            candidate_sets = [tuple(self.trigrams.get(trigram, ())) for trigram in get_trigrams(name)]
+        shared = {}
+        for entries in candidate_sets:
+            for entry in entries:
+                shared[entry] = shared.get(entry, 0) + 1
+
+        max_distance = max(1, min(3, len(name) // 3)) # One typo for short names, up to three for long ones
+        candidates = sorted(shared, key=lambda entry: -shared[entry])[:50] # Edit distance only for best trigram matches
+        matches = []
+        for entry in candidates:
+            distance = edit_distance(name, entry[0], max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -shared[entry], entry))
+
+        return [{'city': city, 'country': country} for _, _, (_, city, country) in sorted(matches)[:limit]]
+
+
+city_index = CityIndex.from_file(BUNDLED_CITIES) # Loaded once per process, gunicorn preloads it in master
+last_sync = 0.0
+
+
+def get_resolved_cities(): # [city, country] pairs resolved by all processes, empty when Redis is unreachable
+    if not cache.redis_available():
+        return []
+    try:
+        return [json.loads(member) for member in get_redis().smembers(RESOLVED_CITIES_KEY)]
+    except REDIS_ERRORS as error:
+        cache.report_failure(error)
+        return []
+
+
+def get_city_index(): # Index with cities resolved by all processes, Redis is checked at most once per SYNC_INTERVAL
+    global last_sync
+    if time.monotonic() - last_sync > SYNC_INTERVAL:
+        last_sync = time.monotonic()
+        for city, country in get_resolved_cities():
+            city_index.add(city, country)
+    return city_index
+
+
+def remember_city(city, country): # Add city resolved by weather API, so other users get it in suggestions
+    if not city_index.add(city, country) or not cache.redis_available():
+        return
+
+    try: # SADD is atomic, so concurrent processes don't overwrite each other's cities. Limit may be exceeded by a few of them
+        redis_client = get_redis()
+        if redis_client.scard(RESOLVED_CITIES_KEY) < RESOLVED_CITIES_LIMIT: # Rare write: bundled list covers most searches
+            redis_client.sadd(RESOLVED_CITIES_KEY, json.dumps([city, country], ensure_ascii=False))
+    except REDIS_ERRORS as error:
+        cache.report_failure(error)
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from .metrics import REDIS_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+REDIS_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) # Redis is unreachable, not a bad command
+redis_client = None
+FALLBACK_METHODS = ['add', 'get', 'set', 'touch', 'delete', 'get_many', 'has_key', 'incr', 'set_many', 'delete_many', 'clear']
+
+
+def get_redis(): # Shared client for Redis commands that Django cache API doesn't have
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.Redis.from_url(settings.REDIS_URL, **settings.REDIS_POOL_OPTIONS)
+    return redis_client
+
+
+class RedisHealth: # Shared by cache objects of all threads of the process, Django creates cache object per thread
+    def __init__(self, location):
+        self.location = location
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+    def is_available(self): # False until backoff after last failure is over, so requests don't wait for socket timeouts
+        return time.monotonic() >= self.retry_at
+
+    def failed(self, error):
+        with self.lock:
+            self.failures += 1
+            backoff = min(settings.REDIS_RETRY_MAX_BACKOFF, settings.REDIS_RETRY_BACKOFF * 2 ** (self.failures - 1))
+            self.retry_at = time.monotonic() + backoff
+        logger.warning('Redis %s is unreachable (%s), using local cache for %.1fs', self.location, error, backoff)
+
+    def recovered(self):
+        if self.failures:
+            logger.warning('Redis %s is reachable again after %d failed attempts', self.location, self.failures)
+            self.failures = 0
+            self.retry_at = 0.0
+
+
+health_by_location = {}
+health_lock = threading.Lock()
+
+
+def get_health(location):
+    with health_lock:
+        return health_by_location.setdefault(location, RedisHealth(location))
+
+
+class ResilientRedisCache(RedisCache): # RedisCache that serves from bounded in-process LocMemCache while Redis is unreachable
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self.health = get_health(server)
+        self.fallback = LocMemCache(f'redis-fallback:{server}', { # Storage is shared by threads, same as of any LocMemCache
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'OPTIONS': {'MAX_ENTRIES': settings.REDIS_FALLBACK_MAX_ENTRIES},
+        })
+
+    def redis_available(self):
+        return self.health.is_available()
+
+    def report_failure(self, error): # For code that talks to Redis without cache API, e.g. pipelines
+        self.health.failed(error)
+
+    def call(self, method, *args, **kwargs):
+        if self.health.is_available():
+            try:
+                result = getattr(RedisCache, method)(self, *args, **kwargs)
+            except REDIS_ERRORS as error:
+                self.health.failed(error)
+            else:
+                self.health.recovered()
+                return result
+
+        REDIS_FALLBACKS.labels(method).inc()
+        return getattr(self.fallback, method)(*args, **kwargs)
+
+
+def make_fallback_method(method):
+    def fallback_method(self, *args, **kwargs):
+        return self.call(method, *args, **kwargs)
+
+    fallback_method.__name__ = method
+    return fallback_method
+
+
+for method_name in FALLBACK_METHODS:
+    setattr(ResilientRedisCache, method_name, make_fallback_method(method_name))
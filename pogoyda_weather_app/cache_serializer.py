@@ -0,0 +1,105 @@
+import pickle
+import threading
+import zlib
+
+import orjson
+from django.conf import settings
+
+try: # Optional faster codecs, zlib from standard library is used when they aren't installed
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# First byte of every stored value is its format, so processes of old and new release can share one Redis:
+# a process reads every format it knows and treats unknown format as cache miss.
+JSON = 1
+JSON_ZLIB = 2
+JSON_ZSTD = 3
+JSON_LZ4 = 4
+PICKLE = 5 # Values JSON would change type of, see JSON_OPTIONS
+PICKLE_ZLIB = 6
+PICKLE_PROTOCOL_MARK = 0x80 # Values written by Django's default serializer are plain pickles
+
+ZLIB_LEVEL = 3 # Forecast is 8% of JSON size with it and 2 times faster than default level 6 that saves a few more percent
+
+zstd_contexts = threading.local() # Zstd compressor and decompressor aren't thread-safe, every thread of a worker gets its own pair
+
+
+def zstd_compress(data):
+    if not hasattr(zstd_contexts, 'compressor'):
+        zstd_contexts.compressor = zstandard.ZstdCompressor()
+    return zstd_contexts.compressor.compress(data)
+
+
+def zstd_decompress(data):
+    if not hasattr(zstd_contexts, 'decompressor'):
+        zstd_contexts.decompressor = zstandard.ZstdDecompressor()
+    return zstd_contexts.decompressor.decompress(data)
+
+
+COMPRESSORS = {'zlib': (lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress)}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = (zstd_compress, zstd_decompress)
+if lz4 is not None:
+    COMPRESSORS['lz4'] = (lz4.frame.compress, lz4.frame.decompress)
+
+COMPRESSED_FORMATS = {'zlib': JSON_ZLIB, 'zstd': JSON_ZSTD, 'lz4': JSON_LZ4}
+DECOMPRESSORS = {JSON_ZLIB: 'zlib', JSON_ZSTD: 'zstd', JSON_LZ4: 'lz4'}
+
+
+# Values orjson can't store without changing their type raise TypeError and are pickled: datetimes, str/int/dict subclasses
+# (SafeString of cached template fragments, OrderedDict), dataclasses and any other objects. Tuples are stored as lists,
+# the same as with Django's JSON session serializer
+JSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class CompactSerializer: # Redis cache serializer: orjson, compression above threshold, format byte. OPTIONS['serializer'] of CACHES
+    def __init__(self, compression=None, compress_min_size=None, write_format=None):
+        compression = compression or settings.CACHE_COMPRESSION
+        self.write_format = write_format or settings.CACHE_SERIALIZER_WRITE_FORMAT
+        self.compression = compression if compression in COMPRESSORS else 'zlib' # Chosen codec isn't installed
+        self.compress_min_size = settings.CACHE_COMPRESS_MIN_SIZE if compress_min_size is None else compress_min_size
+
+    def dumps(self, obj):
+        if type(obj) is int: # Integers stay raw so INCR works on ratelimit counters, same as in Django's serializer
+            return obj
+        if self.write_format == 'pickle': # First step of rollout: previous release can read only plain pickles
+            return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+        try:
+            data, format_byte = orjson.dumps(obj, option=JSON_OPTIONS), JSON
+        except TypeError: # Also integers longer than 64 bits and dicts with non-string keys
+            data, format_byte = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), PICKLE
+
+        if len(data) < self.compress_min_size: # Small values like error markers and counters are not worth compressing
+            return bytes([format_byte]) + data
+        if format_byte == PICKLE:
+            return bytes([PICKLE_ZLIB]) + zlib.compress(data, ZLIB_LEVEL)
+        return bytes([COMPRESSED_FORMATS[self.compression]]) + COMPRESSORS[self.compression][0](data)
+
+    def loads(self, data):
+        try:
+            return int(data)
+        except ValueError:
+            pass
+
+        format_byte, payload = data[0], data[1:]
+        if format_byte == JSON:
+            return orjson.loads(payload)
+        if format_byte in DECOMPRESSORS:
+            codec = DECOMPRESSORS[format_byte]
+            if codec not in COMPRESSORS: # Written by process that has optional codec installed
+                return None
+            return orjson.loads(COMPRESSORS[codec][1](payload))
+        if format_byte == PICKLE:
+            return pickle.loads(payload)
+        if format_byte == PICKLE_ZLIB:
+            return pickle.loads(zlib.decompress(payload))
+        if format_byte == PICKLE_PROTOCOL_MARK:
+            return pickle.loads(data)
+        return None # Format of newer release, read as cache miss
@@ -0,0 +1,78 @@
+import ast
+import gettext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+def read_po_messages(po_path): # Get translated and not fuzzy messages from .po file as {msgid: msgstr}
+    messages = {}
+    entry = {}
+    field = None
+    fuzzy = False
+
+    def save_entry():
+        if entry.get('msgid') and entry.get('msgstr') and not fuzzy and 'msgid_plural' not in entry and 'msgctxt' not in entry:
+            messages[entry['msgid']] = entry['msgstr']
+
+    with open(po_path, encoding='utf-8') as po_file:
+        for line in po_file:
+            line = line.strip()
+
+            if not line: # Empty line separates entries
+                save_entry()
+                entry, field, fuzzy = {}, None, False
+                continue
+
+            if line.startswith('#,') and 'fuzzy' in line:
+                fuzzy = True
+            elif line.startswith('#'):
+                continue
+            elif line.startswith('"') and field: # Continuation of multiline string
+                entry[field] += ast.literal_eval(line)
+            else:
+                field, _, value = line.partition(' ')
+                entry[field] = ast.literal_eval(value)
+
+    save_entry()
+    return messages
+
+
+def get_outdated_messages(po_path, mo_path): # Compare source catalog with compiled one, return messages that .mo doesn't have
+    with open(mo_path, 'rb') as mo_file:
+        compiled_catalog = gettext.GNUTranslations(mo_file)._catalog
+
+    return [msgid for msgid, msgstr in read_po_messages(po_path).items() if compiled_catalog.get(msgid) != msgstr]
+
+
+@register(Tags.translation)
+def check_compiled_translations(app_configs, **kwargs): # Every .po catalog must be compiled to up to date .mo, otherwise users see untranslated pages
+    errors = []
+
+    for locale_path in settings.LOCALE_PATHS:
+        for lang_code, lang_name in settings.LANGUAGES:
+            po_path = Path(locale_path) / lang_code / 'LC_MESSAGES' / 'django.po'
+            mo_path = po_path.with_suffix('.mo')
+
+            if not po_path.exists():
+                continue
+
+            if not mo_path.exists():
+                errors.append(Error(
+                    f'Translation catalog {po_path} is not compiled.',
+                    hint='Run "python manage.py compilemessages".',
+                    id='pogoyda_weather_app.E001',
+                ))
+                continue
+
+            outdated_messages = get_outdated_messages(po_path, mo_path)
+            if outdated_messages:
+                errors.append(Warning(
+                    f'Compiled catalog {mo_path} is missing {len(outdated_messages)} translation(s) from {po_path.name}, '
+                    f'e.g. "{outdated_messages[0]}".',
+                    hint='Run "python manage.py compilemessages".',
+                    id='pogoyda_weather_app.W001',
+                ))
+
+    return errors
@@ -0,0 +1,100 @@
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.translation import gettext as _
+
+from .models import CustomUser
+from .weather_cache import get_weather_from_cache
+
+DIGEST_FRAGMENT_TIMEOUT = 6 * 3600 # Digest run takes minutes, fragments only need to outlive it and its resumption
+
+
+def summarize_day(weather_data): # Today's numbers for digest: temperature range, strongest wind and most frequent condition
+    location = weather_data['location']
+    hours = weather_data['forecast']['forecastday'][0]['hour']
+    condition = Counter(hour['condition']['text'] for hour in hours).most_common(1)[0][0]
+    icon = next(hour['condition']['icon'] for hour in hours if hour['condition']['text'] == condition)
+    return {
+        'city': location['name'],
+        'country': location['country'],
+        'min_temp_c': min(hour['temp_c'] for hour in hours),
+        'max_temp_c': max(hour['temp_c'] for hour in hours),
+        'max_wind_kph': max(hour['wind_kph'] for hour in hours),
+        'condition_text': condition,
+        'condition_icon': 'https:' + icon if icon.startswith('//') else icon, # Mail clients don't resolve protocol-relative URLs
+    }
+
+
+def get_digest_language(user):
+    return user.forecast_digest_language or settings.LANGUAGE_CODE
+
+
+def get_fragment_key(city, country, language, date):
+    return f'digest_fragment:{date:%Y-%m-%d}:{language}:{city}:{country}'
+
+
+def get_city_fragments(cities, date): # (city, country, language) -> rendered HTML block, every city is rendered once per day and language
+    keys = {city_key: get_fragment_key(*city_key, date) for city_key in cities}
+    cached = cache.get_many(keys.values())
+    fragments = {city_key: cached.get(key) for city_key, key in keys.items()}
+
+    rendered = {}
+    for (city, country, language), fragment in fragments.items():
+        if fragment is not None:
+            continue
+        weather_data = get_weather_from_cache(city) # Other languages of the city find it in weather cache
+        if not isinstance(weather_data, dict): # City not found or weather API error, it's left out of today's emails
+            continue
+        with translation.override(language):
+            fragment = render_to_string('forecast_digest_city.html', summarize_day(weather_data))
+        fragments[city, country, language] = rendered[keys[city, country, language]] = fragment
+    cache.set_many(rendered, DIGEST_FRAGMENT_TIMEOUT)
+    return fragments
+
+
+def make_digest(user, fragments):
+    with translation.override(get_digest_language(user)):
+        message = EmailMessage(_('Weather forecast for today'), render_to_string('forecast_digest.html', {'user': user, 'fragments': fragments}),
+                               settings.DEFAULT_FROM_EMAIL, [user.email])
+    message.content_subtype = 'html'
+    return message
+
+
+def chunks(iterable, size): # itertools.batched of Python 3.12
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def send_digests(date, chunk_size=None): # Returns number of sent emails. Users already sent today are skipped, so run can be repeated
+    chunk_size = chunk_size or settings.FORECAST_DIGEST_CHUNK_SIZE
+    users = (CustomUser.objects
+             .filter(forecast_digest=True)
+             .exclude(forecast_digest_sent_on=date)
+             .order_by('id')
+             .only('id', 'username', 'email', 'forecast_digest_language')
+             .prefetch_related('favoritelocation_set') # One query for favorites of every chunk
+             .iterator(chunk_size=chunk_size)) # Constant memory whatever number of users
+
+    sent = 0
+    with get_connection() as connection: # One SMTP session for the whole run
+        for chunk in chunks(users, chunk_size):
+            cities = {(favorite.city, favorite.country, get_digest_language(user))
+                      for user in chunk for favorite in user.favoritelocation_set.all()}
+            fragments = get_city_fragments(cities, date) # Cities shared by users of the chunk are fetched once
+
+            messages = []
+            for user in chunk:
+                user_keys = [(favorite.city, favorite.country, get_digest_language(user)) for favorite in user.favoritelocation_set.all()]
+                user_fragments = [fragments[key] for key in user_keys if fragments.get(key)]
+                if user_fragments:
+                    messages.append(make_digest(user, user_fragments))
+
+            sent += connection.send_messages(messages) or 0
+            CustomUser.objects.filter(id__in=[user.id for user in chunk]).update(forecast_digest_sent_on=date) # Checkpoint
+    return sent
@@ -4,7 +4,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
-from .models import CustomUser
+from .models import CustomUser, WeatherAlert
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.contrib.auth.hashers import make_password
 from django.core.validators import RegexValidator
@@ -131,4 +131,20 @@ class EmailValidateForm(forms.Form):
 
         if not CustomUser.objects.filter(email=email).exists():
             raise forms.ValidationError(_('A user with that email not exists.'))
-        return email
\ No newline at end of file
+        return email
+
+
+class WeatherAlertForm(forms.ModelForm):
+    class Meta:
+        model = WeatherAlert
+        fields = ['metric', 'threshold']
+        widgets = {
+            'metric': forms.Select(attrs={'class': 'form-input'}),
+            'threshold': forms.NumberInput(attrs={'class': 'form-input', 'step': 'any'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('metric') != WeatherAlert.RAIN and cleaned_data.get('threshold') is None:
+            raise forms.ValidationError(_('Set threshold for this alert.'))
+        return cleaned_data
@@ -0,0 +1,25 @@
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(lat, lon, precision): # Standard geohash: precision 5 is a ~5x5 km cell, 4 is ~39x20 km
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, char_index, even = 0, 0, True
+
+    while len(geohash) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        char_index <<= 1
+        if value >= middle:
+            char_index |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+
+        bits += 1
+        if bits == 5:
+            geohash.append(GEOHASH_ALPHABET[char_index])
+            bits, char_index = 0, 0
+
+    return ''.join(geohash)
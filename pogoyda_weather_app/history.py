@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Avg, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ForecastObservation
+
+
+def make_observation(location, kind, epoch, data): # Weather API entry -> unsaved observation
+    return ForecastObservation(
+        city=location['name'],
+        country=location['country'],
+        kind=kind,
+        observed_at=datetime.fromtimestamp(epoch, tz=dt_timezone.utc),
+        temp_c=data['temp_c'],
+        wind_kph=data['wind_kph'],
+        humidity=data['humidity'],
+        condition_code=data['condition']['code'],
+    )
+
+
+def record_forecast(weather_data): # Append current weather and hourly forecast of fetched data, newer forecast for the same hour replaces older one
+    if not settings.FORECAST_HISTORY_ENABLED:
+        return 0
+
+    location = weather_data['location']
+    observations = [make_observation(location, ForecastObservation.CURRENT, weather_data['current']['last_updated_epoch'], weather_data['current'])]
+    for day_data in weather_data['forecast']['forecastday']:
+        observations += [make_observation(location, ForecastObservation.HOURLY, hour_data['time_epoch'], hour_data)
+                         for hour_data in day_data['hour']]
+
+    ForecastObservation.objects.bulk_create( # One INSERT for all rows, conflicts are resolved by the database
+        observations,
+        update_conflicts=True,
+        unique_fields=['city', 'country', 'kind', 'observed_at'],
+        update_fields=['temp_c', 'wind_kph', 'humidity', 'condition_code'],
+    )
+    return len(observations)
+
+
+def get_history(city, days): # Observations of the last `days` days, oldest first, from the database only
+    since = timezone.now() - timedelta(days=days)
+    return (ForecastObservation.objects
+            .filter(city__iexact=city, observed_at__gte=since, observed_at__lte=timezone.now())
+            .order_by('observed_at', 'kind')
+            .values('kind', 'observed_at', 'temp_c', 'wind_kph', 'humidity', 'condition_code'))
+
+
+def downsample_history(older_than_days): # Replace current and hourly rows older than given age with one daily average per city
+    cutoff = (timezone.now() - timedelta(days=older_than_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    detailed = ForecastObservation.objects.filter(kind__in=[ForecastObservation.CURRENT, ForecastObservation.HOURLY], observed_at__lt=cutoff)
+
+    daily_rows = (detailed
+                  .annotate(date=TruncDate('observed_at'))
+                  .values('city', 'country', 'date')
+                  .annotate(temp_c=Avg('temp_c'), wind_kph=Avg('wind_kph'), humidity=Avg('humidity'),
+                            condition_code=Max('condition_code')) # Higher weather API codes mean worse weather, keep the worst one
+                  .order_by())
+
+    ForecastObservation.objects.bulk_create(
+        [ForecastObservation(
+            city=row['city'],
+            country=row['country'],
+            kind=ForecastObservation.DAILY,
+            observed_at=datetime.combine(row['date'], datetime.min.time(), tzinfo=dt_timezone.utc),
+            temp_c=round(row['temp_c'], 1),
+            wind_kph=round(row['wind_kph'], 1),
+            humidity=round(row['humidity']),
+            condition_code=row['condition_code'],
+        ) for row in daily_rows],
+        update_conflicts=True,
+        unique_fields=['city', 'country', 'kind', 'observed_at'],
+        update_fields=['temp_c', 'wind_kph', 'humidity', 'condition_code'],
+    )
+    deleted, _ = detailed.delete()
+    return deleted
+
+
+def prune_history(retention_days): # Delete everything older than retention period
+    deleted, _ = ForecastObservation.objects.filter(observed_at__lt=timezone.now() - timedelta(days=retention_days)).delete()
+    return deleted
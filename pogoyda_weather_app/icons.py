@@ -0,0 +1,39 @@
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.templatetags.static import static
+
+ICON_URL_RE = re.compile(r'/(day|night)/(\d+)\.png$') # //cdn.weatherapi.com/weather/64x64/day/113.png -> ('day', '113')
+ICONS_STATIC_PATH = 'images/conditions' # Relative to static files, mirror_condition_icons writes icons there
+
+
+def get_icon_path(period, icon):
+    return f'{ICONS_STATIC_PATH}/{period}/{icon}.png'
+
+
+MISSING_ICON_RECHECK = 300 # Seconds, icons mirrored while the process runs are picked up after this
+
+icon_urls = {} # Static path -> (local URL or None, when checked), there are ~100 icons, each is looked up once per process
+
+
+def find_mirrored_icon(path): # URL of mirrored copy, None if it isn't mirrored or isn't collected into the manifest yet
+    if not (Path(settings.CONDITION_ICONS_ROOT) / path).exists():
+        return None
+    try:
+        return static(path)
+    except ValueError: # Mirrored after collectstatic: strict manifest storage has no hashed name for it
+        return None
+
+
+def get_local_icon_url(icon_url): # Weather API icon URL -> content-hashed URL of mirrored copy, icon URL as is when it isn't mirrored
+    match = ICON_URL_RE.search(icon_url)
+    if not match:
+        return icon_url
+    path = get_icon_path(*match.groups())
+    local_url, checked_at = icon_urls.get(path, (None, None))
+    if local_url is None and (checked_at is None or time.monotonic() - checked_at > MISSING_ICON_RECHECK):
+        local_url = find_mirrored_icon(path)
+        icon_urls[path] = (local_url, time.monotonic())
+    return local_url or icon_url
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import logging
+
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache_backend import REDIS_ERRORS, get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'weather_updates:'
+LIVE_FIELDS = ['temp_c', 'feelslike_c', 'wind_kph', 'wind_mph', 'humidity', 'condition', 'last_updated_epoch']
+
+
+def get_channel(city): # One channel per weather cache key, i.e. per query pages were rendered from and keep_fresh() refreshes
+    return CHANNEL_PREFIX + city
+
+
+def publish_update(city, weather_data): # Called when cache entry of `city` is refreshed, every process forwards it to clients watching it
+    if not cache.redis_available():
+        return
+    message = {'city': weather_data['location']['name'], 'current': {field: weather_data['current'].get(field) for field in LIVE_FIELDS}}
+    try:
+        get_redis().publish(get_channel(city), json.dumps(message))
+    except REDIS_ERRORS as error:
+        cache.report_failure(error)
+
+
+class LiveUpdates: # Per process: one Redis subscription per city with connected clients, messages fan out to their queues
+    def __init__(self):
+        self.loop = None
+
+    def reset(self): # State belongs to event loop it was created in, uvicorn worker has one loop, tests have one per test
+        self.loop = asyncio.get_running_loop()
+        self.redis = aioredis.Redis.from_url(settings.REDIS_URL, **settings.REDIS_POOL_OPTIONS)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.queues = {} # Channel -> queues of connected clients
+        self.refreshers = {} # Channel -> task that keeps cache entry of the city fresh
+        self.reader = None
+
+    async def subscribe(self, city, refresh):
+        if self.loop is not asyncio.get_running_loop():
+            self.reset()
+
+        channel = get_channel(city)
+        queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        if channel not in self.queues: # First client of the city in this process
+            self.queues[channel] = set()
+            await self.pubsub.subscribe(channel)
+            self.refreshers[channel] = asyncio.create_task(self.keep_fresh(city, channel, refresh))
+        self.queues[channel].add(queue)
+
+        if self.reader is None or self.reader.done():
+            self.reader = asyncio.create_task(self.read_messages())
+        return queue
+
+    async def unsubscribe(self, city, queue):
+        channel = get_channel(city)
+        clients = self.queues.get(channel, set())
+        clients.discard(queue)
+        if not clients and channel in self.queues: # Last client of the city left
+            del self.queues[channel]
+            self.refreshers.pop(channel).cancel()
+            await self.pubsub.unsubscribe(channel)
+
+    async def read_messages(self): # Single reader of the subscription connection
+        while self.queues:
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except REDIS_ERRORS as error:
+                logger.warning('Live updates subscription failed (%s), retrying', error)
+                await asyncio.sleep(settings.REDIS_RETRY_BACKOFF)
+                continue
+            if message is None:
+                continue
+
+            update = json.loads(message['data'])
+            for queue in self.queues.get(message['channel'].decode(), ()):
+                if queue.full(): # Slow client gets only the newest update
+                    queue.get_nowait()
+                queue.put_nowait(update)
+
+    async def keep_fresh(self, city, channel, refresh): # Refresh expired cache entry, one process of all does it per interval
+        while True:
+            if await sync_to_async(cache.add)(f'live_refresh:{channel}', 1, settings.LIVE_REFRESH_INTERVAL):
+                try:
+                    await sync_to_async(refresh)(city) # Publishes update if cache entry had expired and was fetched again
+                except Exception: # Weather API errors must not stop updates of the city
+                    logger.exception('Live refresh of %s failed', city)
+            await asyncio.sleep(settings.LIVE_REFRESH_INTERVAL)
+
+
+live_updates = LiveUpdates()
@@ -0,0 +1,60 @@
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache.backends.redis import RedisSerializer
+from django.core.management.base import BaseCommand
+
+from pogoyda_weather_app.cache_serializer import COMPRESSORS, CompactSerializer
+from pogoyda_weather_app.sample_data import SAMPLE_CITIES, make_forecast_response
+
+
+def get_payloads(): # Forecasts recorded with `benchmarks.run --record` if there are any, otherwise sample forecasts of every city
+    recordings = [json.loads(path.read_text(encoding='utf-8')) for path in sorted(Path(settings.WEATHER_REPLAY_DIR).glob('*.json'))]
+    payloads = [recording for recording in recordings if 'forecast' in recording]
+    if payloads:
+        return payloads
+    return [make_forecast_response(city, region, country, lat, lon, days=settings.FORECAST_MAX_DAYS)
+            for city, (region, country, lat, lon) in SAMPLE_CITIES.items()]
+
+
+def get_serializers(): # Name -> serializer, Django's pickle serializer is the baseline
+    serializers = {'pickle (Django)': RedisSerializer(), 'json': CompactSerializer(compress_min_size=float('inf'))}
+    for codec in COMPRESSORS:
+        serializers[f'json + {codec}'] = CompactSerializer(compression=codec, compress_min_size=0)
+    return serializers
+
+
+def measure(serializer, payloads, iterations): # Average stored size in bytes and encode/decode time in microseconds per value
+    encoded = [serializer.dumps(payload) for payload in payloads]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for payload in payloads:
+            serializer.dumps(payload)
+    encode_time = (time.perf_counter() - started) * 1_000_000 / (iterations * len(payloads))
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for data in encoded:
+            serializer.loads(data)
+    decode_time = (time.perf_counter() - started) * 1_000_000 / (iterations * len(payloads))
+    return sum(map(len, encoded)) / len(encoded), encode_time, decode_time
+
+
+class Command(BaseCommand):
+    help = 'Compare stored size and encode/decode time of cached forecasts with pickle, JSON and compressed JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        payloads = get_payloads()
+        self.stdout.write(f'{len(payloads)} forecasts')
+        self.stdout.write(f'{"serializer":<20}{"bytes":>10}{"encode, us":>12}{"decode, us":>12}{"size":>8}')
+
+        baseline_size = None
+        for name, serializer in get_serializers().items():
+            size, encode_time, decode_time = measure(serializer, payloads, options['iterations'])
+            baseline_size = baseline_size or size
+            self.stdout.write(f'{name:<20}{size:>10.0f}{encode_time:>12.1f}{decode_time:>12.1f}{size / baseline_size:>7.0%}')
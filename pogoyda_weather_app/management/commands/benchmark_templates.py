@@ -0,0 +1,86 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory, override_settings
+
+from pogoyda_weather_app.forms import CustomUserCreationForm, CustomUserLoginForm, CustomUserRestorePasswordForm, EmailValidateForm
+from pogoyda_weather_app.sample_data import make_forecast_response
+from pogoyda_weather_app.views import extract_forecast_data, get_forecast_version
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', PLAIN_LOADERS)]
+
+
+def get_index_context(): # Same context as index view builds for a found city
+    weather_data = make_forecast_response()
+    forecast = extract_forecast_data(weather_data, 'en')
+    localtime = datetime.strptime(forecast['current']['localtime'], '%Y-%m-%d %H:%M')
+    return {
+        'current_weather': forecast['current'], 'location': forecast['location'], 'localtime': localtime,
+        'time_list': tuple(localtime.strftime('%d %B %H:%M').split()), 'forecast': forecast['forecast_by_days'],
+        'canonical_city': forecast['location']['city'], 'cache_city': forecast['location']['city'], 'lang': 'en',
+        'forecast_version': get_forecast_version(weather_data),
+    }
+
+
+def get_template_contexts(): # Template name -> context, one entry for every page template
+    return {
+        'index.html': get_index_context(),
+        'login_page.html': {'form': CustomUserLoginForm()},
+        'register_page.html': {'form': CustomUserCreationForm()},
+        'password_recovery.html': {'email_form': EmailValidateForm()},
+        'recovery_notify.html': {'email_form': EmailValidateForm()},
+        'restore_account_page.html': {'form': CustomUserRestorePasswordForm(), 'username': 'testuser'},
+        'confirm_register.html': {},
+        'email_notify.html': {},
+        'incorrect_city.html': {'city': 'NonExistCity123'},
+        'api_error.html': {},
+        'too_many_requests.html': {},
+        'expired_token.html': {},
+        'invalid_token.html': {},
+    }
+
+
+def make_engine(loaders): # Template engine with project options but with given loaders
+    options = dict(settings.TEMPLATES[0]['OPTIONS'], loaders=loaders)
+    return DjangoTemplates({'NAME': 'benchmark', 'DIRS': settings.TEMPLATES[0]['DIRS'], 'APP_DIRS': False, 'OPTIONS': options})
+
+
+def measure_render_time(engine, template_name, context, request, iterations): # Average time of get_template + render in milliseconds
+    started = time.perf_counter()
+    for _ in range(iterations):
+        engine.get_template(template_name).render(context, request)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+class Command(BaseCommand):
+    help = 'Measure render time of every page template with plain loaders (before) and with cached loader (after)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = {}
+
+        # Forecast fragment cache is kept in memory so Redis latency does not get into template numbers
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            plain_engine = make_engine(PLAIN_LOADERS)
+            cached_engine = make_engine(CACHED_LOADERS)
+
+            self.stdout.write(f'{"template":<28}{"plain, ms":>12}{"cached, ms":>12}{"speedup":>10}')
+            for template_name, context in get_template_contexts().items():
+                measure_render_time(cached_engine, template_name, context, request, 1) # Warm up cached loader
+                plain_time = measure_render_time(plain_engine, template_name, context, request, iterations)
+                cached_time = measure_render_time(cached_engine, template_name, context, request, iterations)
+                self.stdout.write(f'{template_name:<28}{plain_time:>12.3f}{cached_time:>12.3f}{plain_time / cached_time:>9.1f}x')
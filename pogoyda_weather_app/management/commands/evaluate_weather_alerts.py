@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pogoyda_weather_app.alerts import evaluate_alerts
+
+
+class Command(BaseCommand):
+    help = 'Check weather alerts of all users: rules are grouped by city, every city is fetched once through the cache. Run from cron every few minutes.'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = evaluate_alerts()
+        self.stdout.write(f'Checked {result["rules"]} rules in {result["cities"]} cities in {time.perf_counter() - started:.1f}s, '
+                          f'{result["fired"]} fired, {result["emails"]} emails sent')
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pogoyda_weather_app.icons import get_icon_path
+from pogoyda_weather_app.providers import ICON_URL
+
+PERIODS = ['day', 'night']
+
+
+class Command(BaseCommand):
+    help = ('Download weather condition icons from weatherapi.com CDN into static files, so pages serve them with content-hashed names. '
+            'Run before collectstatic, icons that failed to download are still loaded from CDN.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='download icons that were already mirrored again')
+
+    def handle(self, *args, **options):
+        try:
+            conditions = requests.get(settings.WEATHER_CONDITIONS_LINK, timeout=10).json() # [{code, day, night, icon}, ...]
+        except (requests.exceptions.RequestException, ValueError) as error: # Build goes on, pages use CDN icons
+            self.stderr.write(f'Could not load list of weather conditions: {error}')
+            return
+        icons = sorted({condition['icon'] for condition in conditions})
+
+        downloaded = skipped = failed = 0
+        with requests.Session() as session: # One connection to CDN for all icons
+            for period in PERIODS:
+                for icon in icons:
+                    path = Path(settings.CONDITION_ICONS_ROOT) / get_icon_path(period, icon)
+                    if path.exists() and not options['overwrite']:
+                        skipped += 1
+                        continue
+                    try:
+                        response = session.get('https:' + ICON_URL.format(period=period, icon=icon), timeout=10)
+                        response.raise_for_status()
+                    except requests.exceptions.RequestException as error:
+                        self.stderr.write(f'{period}/{icon}: {error}')
+                        failed += 1
+                        continue
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_bytes(response.content)
+                    downloaded += 1
+
+        self.stdout.write(f'Downloaded {downloaded} icons, {skipped} already mirrored, {failed} failed')
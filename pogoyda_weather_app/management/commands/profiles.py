@@ -0,0 +1,48 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from pogoyda_weather_app.profiling import list_profiles, read_stacks
+
+
+class Command(BaseCommand):
+    help = ('List request profiles captured by ProfilerMiddleware, or merge them: --collapsed prints stacks for flamegraph.pl '
+            'or speedscope, --top prints functions with the most samples.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='only profiles of this URL name, e.g. index_url')
+        parser.add_argument('--min-duration', type=int, default=0, help='only profiles of requests slower than this, in ms')
+        parser.add_argument('--collapsed', action='store_true', help='print merged collapsed stacks')
+        parser.add_argument('--top', type=int, default=0, help='print this many functions with the most own and total samples')
+
+    def handle(self, *args, **options):
+        profiles = [profile for profile in list_profiles()
+                    if (not options['view'] or profile['view'] == options['view']) and profile['duration_ms'] >= options['min_duration']]
+
+        if not options['collapsed'] and not options['top']:
+            for profile in profiles:
+                self.stdout.write(f'{profile["time"]:%Y-%m-%d %H:%M:%S}  {profile["view"]:<25} {profile["duration_ms"]:>7} ms  '
+                                  f'pid {profile["pid"]:<7} {profile["path"].name}')
+            self.stdout.write(f'{len(profiles)} profiles')
+            return
+
+        stacks = Counter()
+        for profile in profiles:
+            stacks.update(read_stacks(profile['path']))
+
+        if options['collapsed']:
+            for stack, count in stacks.most_common():
+                self.stdout.write(f'{stack} {count}')
+            return
+
+        own, total = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames): # Recursive function is counted once per sample
+                total[frame] += count
+        samples = sum(stacks.values()) or 1
+
+        self.stdout.write(f'{"own":>7} {"total":>7}  function ({len(profiles)} profiles, {samples} samples)')
+        for frame, count in own.most_common(options['top']):
+            self.stdout.write(f'{count / samples:>7.1%} {total[frame] / samples:>7.1%}  {frame}')
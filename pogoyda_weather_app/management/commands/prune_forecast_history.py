@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pogoyda_weather_app.history import downsample_history, prune_history
+
+
+class Command(BaseCommand):
+    help = 'Keep forecast history bounded: downsample old hourly data to daily averages and delete data past retention period. Run daily from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--downsample-after', type=int, default=settings.FORECAST_HISTORY_DOWNSAMPLE_DAYS,
+                            help='days after which current and hourly data is replaced with daily averages')
+        parser.add_argument('--retention', type=int, default=settings.FORECAST_HISTORY_RETENTION_DAYS,
+                            help='days after which all data is deleted')
+
+    def handle(self, *args, **options):
+        pruned = prune_history(options['retention'])
+        downsampled = downsample_history(options['downsample_after'])
+        self.stdout.write(f'Deleted {pruned} expired observations, downsampled {downsampled} detailed observations to daily averages')
@@ -0,0 +1,20 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pogoyda_weather_app.digest import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Email today\'s forecast for favorite cities to subscribed users. Run from cron every morning, rerun resumes interrupted run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.FORECAST_DIGEST_CHUNK_SIZE,
+                            help='users loaded and emails sent at once')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        sent = send_digests(timezone.localdate(), options['chunk_size'])
+        self.stdout.write(f'Sent {sent} forecast digests in {time.perf_counter() - started:.1f}s')
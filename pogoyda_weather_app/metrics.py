@@ -0,0 +1,68 @@
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker writes its values to mmap files in that directory
+# and /metrics aggregates them, so numbers are the same whichever worker answers the scrape
+
+REQUEST_DURATION = Histogram(
+    'pogoyda_request_duration_seconds', 'Time spent processing request', ['view', 'method', 'status'],
+)
+
+SPAN_DURATION = Histogram(
+    'pogoyda_span_duration_seconds', 'Time spent in part of request processing', ['span'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+
+CACHE_REQUESTS = Counter(
+    'pogoyda_cache_requests_total', 'Weather cache lookups', ['tier', 'result'],
+)
+
+UPSTREAM_RESPONSES = Counter(
+    'pogoyda_upstream_responses_total', 'Responses from external APIs', ['service', 'status'],
+)
+
+GEOHASH_SHARED_HITS = Counter( # Each one is an upstream call saved by geohash cache sharing
+    'pogoyda_geohash_shared_hits_total', 'Forecasts served from cache entry fetched for another city in the same geohash cell',
+)
+
+REDIS_FALLBACKS = Counter( # Non-zero rate means Redis is down and every process uses its own local cache
+    'pogoyda_redis_fallbacks_total', 'Cache operations served by in-process cache because Redis is unreachable', ['operation'],
+)
+
+RATELIMIT_REJECTIONS = Counter(
+    'pogoyda_ratelimit_rejections_total', 'Requests rejected by rate limit', ['view'],
+)
+
+
+@contextmanager
+def span(name): # Measure block of code, works as context manager and as decorator
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_DURATION.labels(name).observe(time.perf_counter() - started)
+
+
+def observe_query(execute, sql, params, many, context): # Database execute wrapper, measures every ORM query
+    with span('orm'):
+        return execute(sql, params, many, context)
+
+
+def get_registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'): # Collect values of all workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics(request): # Metrics in Prometheus text format
+    if settings.METRICS_ALLOWED_IPS and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
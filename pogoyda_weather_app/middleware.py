@@ -0,0 +1,21 @@
+import time
+
+from django.db import connection
+
+from .metrics import REQUEST_DURATION, observe_query
+
+
+class MetricsMiddleware: # Measure whole request time and time of every ORM query inside it
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+
+        with connection.execute_wrapper(observe_query):
+            response = self.get_response(request)
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.url_name if resolver_match and resolver_match.url_name else 'unknown'
+        REQUEST_DURATION.labels(view, request.method, response.status_code).observe(time.perf_counter() - started)
+        return response
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+def create_brin_index(apps, schema_editor): # BRIN index is PostgreSQL only, rows are appended in time order so it stays tiny
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS forecast_observation_observed_at_brin '
+            'ON pogoyda_weather_app_forecastobservation USING brin (observed_at)'
+        )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS forecast_observation_observed_at_brin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pogoyda_weather_app', '0002_delete_historyofsearch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(0, 'Current'), (1, 'Hourly'), (2, 'Daily')])),
+                ('observed_at', models.DateTimeField()),
+                ('temp_c', models.FloatField()),
+                ('wind_kph', models.FloatField()),
+                ('humidity', models.PositiveSmallIntegerField()),
+                ('condition_code', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Forecast Observation',
+                'verbose_name_plural': 'Forecast Observations',
+                'constraints': [models.UniqueConstraint(fields=('city', 'country', 'kind', 'observed_at'), name='unique_forecast_observation')],
+            },
+        ),
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
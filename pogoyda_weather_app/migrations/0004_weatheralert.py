@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pogoyda_weather_app', '0003_forecastobservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.PositiveSmallIntegerField(choices=[(0, 'Temperature below, °C'), (1, 'Wind above, km/h'), (2, 'Rain in the forecast')])),
+                ('threshold', models.FloatField(blank=True, null=True)),
+                ('last_notified_at', models.DateTimeField(blank=True, null=True)),
+                ('favorite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='pogoyda_weather_app.favoritelocation')),
+            ],
+            options={
+                'verbose_name': 'Weather Alert',
+                'verbose_name_plural': 'Weather Alerts',
+            },
+        ),
+    ]
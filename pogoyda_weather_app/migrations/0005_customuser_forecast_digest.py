@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pogoyda_weather_app', '0004_weatheralert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='forecast_digest',
+            field=models.BooleanField(default=False, verbose_name='Morning forecast email'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='forecast_digest_sent_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
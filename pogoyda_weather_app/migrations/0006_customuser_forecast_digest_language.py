@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pogoyda_weather_app', '0005_customuser_forecast_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='forecast_digest_language',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
@@ -11,6 +11,9 @@ class CustomUser(AbstractUser):
 
     first_name = None
     last_name = None
+    forecast_digest = models.BooleanField(_("Morning forecast email"), default=False) # Opt-in, see send_forecast_digest command
+    forecast_digest_sent_on = models.DateField(null=True, blank=True) # Date of the last digest, interrupted run resumes with users not sent yet
+    forecast_digest_language = models.CharField(max_length=10, blank=True) # Language of the page user subscribed on, empty is LANGUAGE_CODE
 
     class Meta:
         verbose_name = _("CustomUser")
@@ -29,3 +32,50 @@ class FavoriteLocation(models.Model):
         verbose_name = _("Favorite Location")
         verbose_name_plural = _("Favorite Locations")
         unique_together = (("user", "city", "country"),)
+
+
+class ForecastObservation(models.Model):
+    # Append-only time series of weather for a city: one row per city, kind and moment, numbers only to keep rows small
+    CURRENT = 0 # Observed current weather
+    HOURLY = 1 # Hourly forecast, the latest fetched forecast for the hour wins
+    DAILY = 2 # Daily average, old current and hourly rows are downsampled to it
+    KIND_CHOICES = [(CURRENT, _("Current")), (HOURLY, _("Hourly")), (DAILY, _("Daily"))]
+
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=100)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    observed_at = models.DateTimeField()
+    temp_c = models.FloatField()
+    wind_kph = models.FloatField()
+    humidity = models.PositiveSmallIntegerField()
+    condition_code = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.city} - {self.get_kind_display()} - {self.observed_at:%Y-%m-%d %H:%M} - {self.temp_c}°C"
+
+    class Meta:
+        verbose_name = _("Forecast Observation")
+        verbose_name_plural = _("Forecast Observations")
+        constraints = [
+            models.UniqueConstraint(fields=["city", "country", "kind", "observed_at"], name="unique_forecast_observation"),
+        ]
+
+
+class WeatherAlert(models.Model):
+    # Threshold rule on user's favorite city. Rules are evaluated in bulk per city by evaluate_weather_alerts command, see alerts.py
+    TEMP_BELOW = 0
+    WIND_ABOVE = 1
+    RAIN = 2
+    METRIC_CHOICES = [(TEMP_BELOW, _("Temperature below, °C")), (WIND_ABOVE, _("Wind above, km/h")), (RAIN, _("Rain in the forecast"))]
+
+    favorite = models.ForeignKey(FavoriteLocation, on_delete=models.CASCADE, related_name="alerts")
+    metric = models.PositiveSmallIntegerField(choices=METRIC_CHOICES)
+    threshold = models.FloatField(null=True, blank=True) # Not used by rain alert
+    last_notified_at = models.DateTimeField(null=True, blank=True) # Alert is silent for WEATHER_ALERTS_COOLDOWN after notification
+
+    def __str__(self):
+        return f"{self.favorite} - {self.get_metric_display()} {self.threshold if self.threshold is not None else ''}"
+
+    class Meta:
+        verbose_name = _("Weather Alert")
+        verbose_name_plural = _("Weather Alerts")
@@ -0,0 +1,115 @@
+"""
+Sampling profiler of single requests. A background thread reads the stack of the request's thread every PROFILER_INTERVAL
+seconds, so profiled request is slowed down by a few percent only, and unprofiled requests aren't touched at all.
+
+Profiles are written in collapsed stacks format ("caller;callee;... samples" per line), which flamegraph.pl and
+speedscope.app open as is. Profile name keeps its metadata: <time>-<pid>-<view>-<duration>ms.collapsed
+"""
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_NAME_RE = re.compile(r'^(?P<time>\d{8}-\d{6}-\d{6})-(?P<pid>\d+)-(?P<view>[\w-]+)-(?P<duration>\d+)ms\.collapsed$')
+
+
+def get_frame_name(frame):
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+
+
+class StackSampler(threading.Thread): # Counts stacks of one thread, frames above `root_code` (server and middlewares before profiler) are left out
+    def __init__(self, thread_id, interval, root_code):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_code = root_code
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None and frame.f_code is not self.root_code:
+            names.append(get_frame_name(frame))
+            frame = frame.f_back
+        if names:
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.stacks
+
+
+def save_profile(stacks, view, duration, directory=None, max_files=None): # Directory is a ring: the oldest profiles are deleted over the limit
+    directory = Path(directory or settings.PROFILER_DIR)
+    max_files = max_files or settings.PROFILER_MAX_FILES
+    directory.mkdir(parents=True, exist_ok=True)
+
+    path = directory / f'{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}-{view}-{duration * 1000:.0f}ms.collapsed'
+    path.write_text(''.join(f'{stack} {count}\n' for stack, count in stacks.most_common()))
+
+    profiles = list_profiles(directory)
+    for old_profile in profiles[:max(len(profiles) - max_files, 0)]:
+        old_profile['path'].unlink(missing_ok=True) # Other process may be deleting it too
+    return path
+
+
+def list_profiles(directory=None): # Oldest first
+    profiles = []
+    for path in sorted(Path(directory or settings.PROFILER_DIR).glob('*.collapsed')):
+        match = PROFILE_NAME_RE.match(path.name)
+        if match:
+            profiles.append({'path': path, 'time': datetime.strptime(match['time'], '%Y%m%d-%H%M%S-%f'), 'pid': int(match['pid']),
+                             'view': match['view'], 'duration_ms': int(match['duration'])})
+    return profiles
+
+
+def read_stacks(path):
+    stacks = Counter()
+    for line in Path(path).read_text().splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+
+class ProfilerMiddleware: # Profiles PROFILER_SAMPLE_RATE share of requests and every request with X-Profile header equal to PROFILER_TOKEN
+    def __init__(self, get_response):
+        if not settings.PROFILER_SAMPLE_RATE and not settings.PROFILER_TOKEN:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.headers.get('X-Profile')
+        if token and settings.PROFILER_TOKEN:
+            return hmac.compare_digest(token.encode(), settings.PROFILER_TOKEN.encode()) # Strings with non-ASCII characters can't be compared
+        return random.random() < settings.PROFILER_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILER_INTERVAL, ProfilerMiddleware.__call__.__code__)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            return self.get_response(request) # Streamed body is produced later and isn't in profile
+        finally:
+            stacks = sampler.stop()
+            resolver_match = getattr(request, 'resolver_match', None)
+            view = resolver_match.url_name if resolver_match and resolver_match.url_name else 'unknown'
+            save_profile(stacks, view, time.perf_counter() - started)
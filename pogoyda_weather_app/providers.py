@@ -0,0 +1,323 @@
+"""
+Weather providers. Every provider returns forecast in one internal model, so views, templates, history and cache
+don't depend on provider's API. The model uses weatherapi.com field names, because it was the first provider:
+
+    location: name, region, country, lat, lon, tz_id, localtime ('%Y-%m-%d %H:%M'), localtime_epoch
+    current: last_updated_epoch, temp_c, wind_kph, wind_mph, humidity, condition {text, icon, code}
+    forecast.forecastday[]: date ('%Y-%m-%d'), hour[]: time_epoch, time, temp_c, wind_kph, wind_mph, humidity, condition
+
+Condition codes and icons are weatherapi.com ones for every provider. Providers are chained with WEATHER_PROVIDERS setting:
+the first one is primary, the next ones are used when it's slow, out of quota or failing.
+"""
+import json
+import re
+from datetime import datetime, timezone
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import UPSTREAM_RESPONSES
+
+ICON_URL = '//cdn.weatherapi.com/weather/64x64/{period}/{icon}.png'
+
+
+class ProviderError(Exception): # Provider can't answer now, next provider may
+    pass
+
+
+class ProviderTimeout(ProviderError):
+    pass
+
+
+class QuotaExceeded(ProviderError):
+    pass
+
+
+class CityNotFound(Exception): # Provider answered that there is no such city
+    pass
+
+
+def pick_condition(condition): # Keep only fields of internal model
+    return {'text': condition['text'], 'icon': condition['icon'], 'code': condition['code']}
+
+
+def pick_weather(data, time_fields):
+    weather = {field: data[field] for field in time_fields}
+    weather.update({
+        'temp_c': data['temp_c'],
+        'wind_kph': data['wind_kph'],
+        'wind_mph': data['wind_mph'],
+        'humidity': data['humidity'],
+        'condition': pick_condition(data['condition']),
+    })
+    return weather
+
+
+class WeatherAPIProvider: # weatherapi.com forecast.json
+    name = 'weatherapi'
+    QUOTA_ERROR_CODES = [2006, 2007, 2008, 2009] # Invalid or disabled key, monthly quota exceeded, plan limits
+
+    def get_response(self, city, days, timeout):
+        params = {'key': settings.WEATHERAPI_KEY, 'q': city, 'days': days}
+        try:
+            response = requests.get(settings.WEATHERAPI_REQUESTS_LINK, params=params, timeout=timeout)
+        except requests.exceptions.Timeout:
+            UPSTREAM_RESPONSES.labels(self.name, 'timeout').inc()
+            raise ProviderTimeout(f'{self.name} timed out')
+        except requests.exceptions.RequestException as error:
+            UPSTREAM_RESPONSES.labels(self.name, 'error').inc()
+            raise ProviderError(str(error))
+
+        UPSTREAM_RESPONSES.labels(self.name, response.status_code).inc()
+        try:
+            return response.json()
+        except ValueError:
+            raise ProviderError(f'{self.name} returned status {response.status_code} without JSON')
+
+    def get_forecast(self, city, days, timeout):
+        data = self.get_response(city, days, timeout)
+
+        if 'error' in data:
+            code = data['error'].get('code')
+            if code == 1006: # User entered invalid city
+                raise CityNotFound(city)
+            if code in self.QUOTA_ERROR_CODES:
+                raise QuotaExceeded(data['error'].get('message', ''))
+            raise ProviderError(data['error'].get('message', '')) # Any other error is considered API error
+
+        try:
+            return self.normalize(data)
+        except (KeyError, TypeError) as error:
+            raise ProviderError(f'{self.name} returned unexpected data: {error!r}')
+
+    def normalize(self, data): # Full response is ~10 times bigger than the part the site uses, cache only this part
+        location = data['location']
+        return {
+            'location': {
+                'name': location['name'],
+                'region': location.get('region', ''),
+                'country': location['country'],
+                'lat': location.get('lat'),
+                'lon': location.get('lon'),
+                'tz_id': location.get('tz_id', ''),
+                'localtime': location['localtime'],
+                'localtime_epoch': location.get('localtime_epoch'),
+            },
+            'current': pick_weather(data['current'], ['last_updated_epoch']),
+            'forecast': {'forecastday': [{
+                'date': day['date'],
+                'hour': [pick_weather(hour, ['time_epoch', 'time']) for hour in day['hour']],
+            } for day in data['forecast']['forecastday']]},
+        }
+
+
+# WMO weather code -> weatherapi.com condition code, text and icon number
+WMO_CONDITIONS = {
+    0: (1000, 'Clear', 113),
+    1: (1003, 'Partly cloudy', 116),
+    2: (1003, 'Partly cloudy', 116),
+    3: (1009, 'Overcast', 122),
+    45: (1135, 'Fog', 248),
+    48: (1147, 'Freezing fog', 260),
+    51: (1150, 'Patchy light drizzle', 263),
+    53: (1153, 'Light drizzle', 266),
+    55: (1153, 'Light drizzle', 266),
+    56: (1168, 'Freezing drizzle', 281),
+    57: (1171, 'Heavy freezing drizzle', 284),
+    61: (1183, 'Light rain', 296),
+    63: (1189, 'Moderate rain', 302),
+    65: (1195, 'Heavy rain', 308),
+    66: (1198, 'Light freezing rain', 311),
+    67: (1201, 'Moderate or heavy freezing rain', 314),
+    71: (1213, 'Light snow', 326),
+    73: (1219, 'Moderate snow', 332),
+    75: (1225, 'Heavy snow', 338),
+    77: (1237, 'Ice pellets', 350),
+    80: (1240, 'Light rain shower', 353),
+    81: (1243, 'Moderate or heavy rain shower', 356),
+    82: (1246, 'Torrential rain shower', 359),
+    85: (1255, 'Light snow showers', 368),
+    86: (1258, 'Moderate or heavy snow showers', 371),
+    95: (1276, 'Moderate or heavy rain with thunder', 389),
+    96: (1276, 'Moderate or heavy rain with thunder', 389),
+    99: (1276, 'Moderate or heavy rain with thunder', 389),
+}
+
+
+class OpenMeteoProvider: # open-meteo.com: geocoding of city name, then forecast for coordinates
+    name = 'open_meteo'
+    WEATHER_FIELDS = 'temperature_2m,relative_humidity_2m,wind_speed_10m,weather_code,is_day'
+    LOCATION_CACHE_TIMEOUT = 24 * 3600 # Coordinates of city don't change
+
+    def get_json(self, url, params, timeout):
+        try:
+            response = requests.get(url, params=params, timeout=timeout)
+        except requests.exceptions.Timeout:
+            UPSTREAM_RESPONSES.labels(self.name, 'timeout').inc()
+            raise ProviderTimeout(f'{self.name} timed out')
+        except requests.exceptions.RequestException as error:
+            UPSTREAM_RESPONSES.labels(self.name, 'error').inc()
+            raise ProviderError(str(error))
+
+        UPSTREAM_RESPONSES.labels(self.name, response.status_code).inc()
+        if response.status_code == 429:
+            raise QuotaExceeded(f'{self.name} rate limit exceeded')
+        if response.status_code != 200:
+            raise ProviderError(f'{self.name} returned status {response.status_code}')
+        return response.json()
+
+    def get_location(self, city, timeout):
+        cache_key = f'open_meteo_location:{city.lower()}'
+        location = cache.get(cache_key)
+        if location is None:
+            results = self.get_json(settings.OPEN_METEO_GEOCODING_LINK, {'name': city, 'count': 1, 'language': 'en'}, timeout).get('results')
+            if not results:
+                raise CityNotFound(city)
+            location = results[0]
+            cache.set(cache_key, location, self.LOCATION_CACHE_TIMEOUT)
+        return location
+
+    def get_forecast(self, city, days, timeout):
+        location = self.get_location(city, timeout)
+        data = self.get_json(settings.OPEN_METEO_FORECAST_LINK, {
+            'latitude': location['latitude'],
+            'longitude': location['longitude'],
+            'current': self.WEATHER_FIELDS,
+            'hourly': self.WEATHER_FIELDS,
+            'forecast_days': days,
+            'timezone': 'auto',
+            'timeformat': 'unixtime',
+        }, timeout)
+
+        try:
+            return self.normalize(location, data)
+        except (KeyError, TypeError, IndexError) as error:
+            raise ProviderError(f'{self.name} returned unexpected data: {error!r}')
+
+    def make_weather(self, values, index=None): # One moment of current or hourly block in internal model
+        value = (lambda field: values[field][index]) if index is not None else values.__getitem__
+        code, text, icon = WMO_CONDITIONS.get(value('weather_code'), WMO_CONDITIONS[3])
+        wind_kph = value('wind_speed_10m')
+        return {
+            'temp_c': value('temperature_2m'),
+            'wind_kph': wind_kph,
+            'wind_mph': round(wind_kph / 1.609, 1),
+            'humidity': value('relative_humidity_2m'),
+            'condition': {'text': text, 'icon': ICON_URL.format(period='day' if value('is_day') else 'night', icon=icon), 'code': code},
+        }
+
+    def normalize(self, location, data):
+        offset = data.get('utc_offset_seconds', 0)
+
+        def local_time(epoch):
+            return datetime.fromtimestamp(epoch + offset, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+        forecast_days = {}
+        hourly = data['hourly']
+        for index, epoch in enumerate(hourly['time']):
+            hour = {'time_epoch': epoch, 'time': local_time(epoch)}
+            hour.update(self.make_weather(hourly, index))
+            forecast_days.setdefault(hour['time'][:10], []).append(hour)
+
+        current = {'last_updated_epoch': data['current']['time']}
+        current.update(self.make_weather(data['current']))
+
+        return {
+            'location': {
+                'name': location['name'],
+                'region': location.get('admin1', ''),
+                'country': location.get('country', ''),
+                'lat': location['latitude'],
+                'lon': location['longitude'],
+                'tz_id': data.get('timezone', ''),
+                'localtime': local_time(data['current']['time']),
+                'localtime_epoch': data['current']['time'],
+            },
+            'current': current,
+            'forecast': {'forecastday': [{'date': date, 'hour': hours} for date, hours in forecast_days.items()]},
+        }
+
+
+def get_recording_path(directory, city): # One file per city, name is safe for any city
+    slug = re.sub(r'[^\w]+', '_', city.strip().lower()).strip('_') or '_'
+    return directory / f'{slug}.json'
+
+
+class ReplayProvider: # Serves forecasts captured by RecordingProvider from disk, for offline benchmarks and tests
+    name = 'replay'
+
+    def __init__(self, directory=None):
+        self.directory = directory or settings.WEATHER_REPLAY_DIR
+
+    def get_forecast(self, city, days, timeout):
+        path = get_recording_path(self.directory, city)
+        if not path.exists():
+            raise CityNotFound(city)
+
+        recording = json.loads(path.read_text(encoding='utf-8'))
+        if recording.get('error') == 'City_not_found':
+            raise CityNotFound(city)
+        recording['forecast']['forecastday'] = recording['forecast']['forecastday'][:days]
+        return recording
+
+
+class RecordingProvider: # Passes requests to another provider and writes its answers for ReplayProvider
+    def __init__(self, provider, directory=None):
+        self.provider = provider
+        self.name = provider.name
+        self.directory = directory or settings.WEATHER_REPLAY_DIR
+
+    def get_forecast(self, city, days, timeout):
+        path = get_recording_path(self.directory, city)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            data = self.provider.get_forecast(city, days, timeout)
+        except CityNotFound:
+            path.write_text(json.dumps({'error': 'City_not_found'}), encoding='utf-8')
+            raise
+
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        return data
+
+
+class FailoverProvider: # Asks providers in order, skips providers that recently ran out of quota
+    QUOTA_PAUSE = 3600 # Seconds to skip provider after it reported exceeded quota, shared by all processes through cache
+
+    def __init__(self, providers, failover_timeout):
+        self.providers = providers
+        self.failover_timeout = failover_timeout
+        self.name = providers[0].name
+
+    def get_forecast(self, city, days, timeout):
+        error = ProviderError('no weather providers available')
+        for index, provider in enumerate(self.providers):
+            if cache.get(f'provider_quota_exceeded:{provider.name}'):
+                continue
+
+            is_last = index == len(self.providers) - 1
+            try: # Don't wait for slow provider long if there is another one to ask
+                return provider.get_forecast(city, days, timeout if is_last else min(timeout, self.failover_timeout))
+            except QuotaExceeded as quota_error:
+                cache.set(f'provider_quota_exceeded:{provider.name}', True, self.QUOTA_PAUSE)
+                error = quota_error
+            except ProviderError as provider_error:
+                error = provider_error
+            UPSTREAM_RESPONSES.labels(provider.name, 'failover').inc()
+        raise error
+
+
+PROVIDERS = {
+    'weatherapi': WeatherAPIProvider,
+    'open_meteo': OpenMeteoProvider,
+    'replay': ReplayProvider,
+}
+
+
+def get_provider(): # Provider chain from settings
+    providers = [PROVIDERS[name]() for name in settings.WEATHER_PROVIDERS]
+    if settings.WEATHER_RECORD:
+        providers = [RecordingProvider(provider) for provider in providers]
+    if len(providers) == 1:
+        return providers[0]
+    return FailoverProvider(providers, settings.WEATHER_PROVIDER_FAILOVER_TIMEOUT)
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_ratelimit.exceptions import Ratelimited
+
+from .cache_backend import REDIS_ERRORS
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate): # '30/m' -> (30, 60)
+    limit, period = rate.split('/')
+    return int(limit), RATE_PERIODS[period[-1]] * int(period[:-1] or 1)
+
+
+class RedisBatch: # Request-scoped Redis access: reads the view needs go in one pipeline, writes are sent in one pipeline with the response
+    def __init__(self):
+        self.values = {} # Key -> value read or written during request, None for missing keys
+        self.writes = {} # Key -> (value, timeout), sent by flush()
+
+    def pipeline(self):
+        return cache._cache.get_client(write=True).pipeline(transaction=False)
+
+    def fetch(self, keys, counter=None): # One round trip: increment of ratelimit counter (key, period) and MGET of keys, returns counter value
+        keys = [key for key in keys if key not in self.values]
+        if not cache.redis_available():
+            return self.fetch_from_fallback(keys, counter)
+        try:
+            return self.fetch_from_redis(keys, counter)
+        except REDIS_ERRORS as error:
+            cache.report_failure(error)
+            return self.fetch_from_fallback(keys, counter)
+
+    def fetch_from_redis(self, keys, counter):
+        pipeline = self.pipeline()
+        if counter:
+            counter_key, period = counter
+            pipeline.set(cache.make_and_validate_key(counter_key), 0, ex=period, nx=True) # Counter of new window expires with it
+            pipeline.incr(cache.make_and_validate_key(counter_key))
+        if keys:
+            pipeline.mget([cache.make_and_validate_key(key) for key in keys])
+        results = pipeline.execute()
+
+        if keys:
+            self.values.update({key: None if value is None else cache._cache._serializer.loads(value)
+                                for key, value in zip(keys, results[-1])})
+        return results[1] if counter else None
+
+    def fetch_from_fallback(self, keys, counter): # Redis is down: cache API serves everything from local cache, one call per command
+        self.get_many(keys)
+        if not counter:
+            return None
+        counter_key, period = counter
+        cache.add(counter_key, 0, period)
+        return cache.incr(counter_key)
+
+    def get(self, key, default=None):
+        if key not in self.values:
+            self.values[key] = cache.get(key)
+        return default if self.values[key] is None else self.values[key]
+
+    def get_many(self, keys): # Same result as cache.get_many(), keys that weren't fetched yet are read with one MGET
+        missing = [key for key in keys if key not in self.values]
+        if missing:
+            found = cache.get_many(missing)
+            self.values.update({key: found.get(key) for key in missing})
+        return {key: self.values[key] for key in keys if self.values[key] is not None}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT): # Deferred until flush(), later reads of this request already see new value
+        self.values[key] = value
+        self.writes[key] = (value, timeout)
+
+    def flush(self):
+        writes, self.writes = self.writes, {}
+        if not writes:
+            return
+        if cache.redis_available():
+            pipeline = self.pipeline()
+            for key, (value, timeout) in writes.items():
+                timeout = cache.get_backend_timeout(timeout) # None is no expiry
+                if timeout is not None and timeout <= 0: # Same as cache.set(): expired at once, Redis rejects SET with such EX
+                    pipeline.delete(cache.make_and_validate_key(key))
+                else:
+                    pipeline.set(cache.make_and_validate_key(key), cache._cache._serializer.dumps(value), ex=timeout)
+            try:
+                pipeline.execute()
+                return
+            except REDIS_ERRORS as error:
+                cache.report_failure(error)
+        for key, (value, timeout) in writes.items():
+            cache.set(key, value, timeout)
+
+    def check_ratelimit(self, request, group, rate, keys=()): # Fixed window counter by IP, incremented in the same round trip that reads keys
+        limit, period = parse_rate(rate)
+        window = int(time.time()) // period
+        count = self.fetch(keys, counter=(f'ratelimit:{group}:{request.META["REMOTE_ADDR"]}:{window}', period))
+        if settings.RATELIMIT_ENABLE and count > limit:
+            request.limited = True
+            raise Ratelimited() # Handled by RatelimitMiddleware the same way as @ratelimit rejections
+
+
+class RedisBatchMiddleware: # Gives every request its RedisBatch and sends queued writes once the response is ready
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.redis_batch = RedisBatch()
+        try:
+            return self.get_response(request)
+        finally:
+            request.redis_batch.flush()
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+# Condition codes with day icons the way weatherapi.com returns them, used to make realistic sample forecasts
+SAMPLE_CONDITIONS = [
+    (1000, 'Sunny', '//cdn.weatherapi.com/weather/64x64/day/113.png'),
+    (1003, 'Partly cloudy', '//cdn.weatherapi.com/weather/64x64/day/116.png'),
+    (1006, 'Cloudy', '//cdn.weatherapi.com/weather/64x64/day/119.png'),
+    (1063, 'Patchy rain possible', '//cdn.weatherapi.com/weather/64x64/day/176.png'),
+    (1183, 'Light rain', '//cdn.weatherapi.com/weather/64x64/day/296.png'),
+]
+
+# City name -> (region, country, lat, lon) of sample forecasts: benchmark stub and cache serializer benchmark
+SAMPLE_CITIES = {
+    'Moscow': ('Moscow City', 'Russia', 55.75, 37.62),
+    'Saint Petersburg': ('Saint Petersburg City', 'Russia', 59.89, 30.26),
+    'Novosibirsk': ('Novosibirsk', 'Russia', 55.04, 82.93),
+    'Yekaterinburg': ('Sverdlovsk', 'Russia', 56.85, 60.61),
+    'Kazan': ('Tatarstan', 'Russia', 55.75, 49.13),
+    'Sochi': ('Krasnodar', 'Russia', 43.6, 39.73),
+    'London': ('City of London, Greater London', 'United Kingdom', 51.52, -0.11),
+    'Paris': ('Ile-de-France', 'France', 48.87, 2.33),
+    'Berlin': ('Berlin', 'Germany', 52.52, 13.4),
+    'Madrid': ('Madrid', 'Spain', 40.4, -3.68),
+    'Rome': ('Lazio', 'Italy', 41.9, 12.48),
+    'Tokyo': ('Tokyo', 'Japan', 35.69, 139.69),
+    'New York': ('New York', 'United States of America', 40.71, -74.01),
+    'Istanbul': ('Istanbul', 'Turkey', 41.02, 28.96),
+    'Minsk': ('Minsk', 'Belarus', 53.9, 27.57),
+    'Almaty': ('Almaty', 'Kazakhstan', 43.26, 76.93),
+    'Tbilisi': ('Tbilisi', 'Georgia', 41.72, 44.79),
+    'Dubai': ('Dubai', 'United Arab Emirates', 25.25, 55.28),
+    'Beijing': ('Beijing', 'China', 39.93, 116.39),
+    'Sydney': ('New South Wales', 'Australia', -33.88, 151.22),
+}
+
+
+def make_forecast_response(city='Moscow', region='Moscow City', country='Russia', lat=55.75, lon=37.62, days=3,
+                           last_updated_epoch=1760857200): # Build response in weatherapi.com forecast.json format for benchmarks and local stubs
+    updated_at = datetime.fromtimestamp(last_updated_epoch, tz=timezone.utc)
+    first_day = updated_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    forecast_days = []
+
+    for day_index in range(days):
+        day_start = first_day + timedelta(days=day_index)
+        hours = []
+        for hour in range(24):
+            code, text, icon = SAMPLE_CONDITIONS[(hour // 5 + day_index) % len(SAMPLE_CONDITIONS)]
+            hour_time = day_start + timedelta(hours=hour)
+            hours.append({
+                'time_epoch': int(hour_time.timestamp()),
+                'time': hour_time.strftime('%Y-%m-%d %H:%M'),
+                'temp_c': round(14 - abs(12 - hour) / 2 + day_index, 1),
+                'wind_kph': round(10 + hour % 7 * 1.8, 1),
+                'wind_mph': round((10 + hour % 7 * 1.8) / 1.609, 1),
+                'humidity': 60 + hour % 30,
+                'chance_of_rain': 80 if code >= 1063 else 0,
+                'precip_mm': 0.4 if code >= 1063 else 0.0,
+                'condition': {'text': text, 'icon': icon, 'code': code},
+            })
+        forecast_days.append({'date': day_start.strftime('%Y-%m-%d'), 'date_epoch': int(day_start.timestamp()), 'hour': hours})
+
+    code, text, icon = SAMPLE_CONDITIONS[updated_at.hour // 5 % len(SAMPLE_CONDITIONS)]
+
+    return {
+        'location': {
+            'name': city,
+            'region': region,
+            'country': country,
+            'lat': lat,
+            'lon': lon,
+            'tz_id': 'UTC',
+            'localtime_epoch': last_updated_epoch,
+            'localtime': updated_at.strftime('%Y-%m-%d %H:%M'),
+        },
+        'current': {
+            'last_updated_epoch': last_updated_epoch,
+            'last_updated': updated_at.strftime('%Y-%m-%d %H:%M'),
+            'temp_c': 12.0,
+            'wind_kph': 14.4,
+            'wind_mph': 8.9,
+            'humidity': 70,
+            'precip_mm': 0.0,
+            'condition': {'text': text, 'icon': icon, 'code': code},
+        },
+        'forecast': {'forecastday': forecast_days},
+    }
@@ -0,0 +1,36 @@
+// City autocomplete: suggestions come from server-side index, requests are sent after user stops typing
+
+const city_input = document.querySelector('.city-search[data-autocomplete-url]');
+const suggestions_list = document.getElementById('city-suggestions');
+let autocomplete_timer = null;
+
+if (city_input && suggestions_list) {
+    city_input.addEventListener('input', function() {
+        clearTimeout(autocomplete_timer);
+        const query = city_input.value.trim();
+        if (query.length < 2) {
+            suggestions_list.innerHTML = '';
+            return;
+        }
+
+        autocomplete_timer = setTimeout(function() {
+            fetch(city_input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(function(response) {
+                    return response.json();
+                })
+                .then(function(data) {
+                    if (data.query.trim() !== city_input.value.trim()) {
+                        return; // User kept typing, newer request will fill the list
+                    }
+                    suggestions_list.innerHTML = '';
+                    data.suggestions.forEach(function(suggestion) {
+                        const option = document.createElement('option');
+                        option.value = suggestion.city;
+                        option.label = suggestion.city + ', ' + suggestion.country;
+                        suggestions_list.appendChild(option);
+                    });
+                })
+                .catch(function() {});
+        }, 150);
+    });
+}
@@ -0,0 +1,45 @@
+// Lazy forecast: hours of next days and hourly detail are loaded only when user asks for them
+
+function load_forecast(element) {
+    const target = document.getElementById(element.dataset.forecastTarget);
+    if (!target || element.dataset.loaded) {
+        return;
+    }
+    element.dataset.loaded = 'true';
+    target.dataset.source = element.dataset.forecastUrl; // Response of slower earlier request must not overwrite newer one
+
+    fetch(element.dataset.forecastUrl)
+        .then(function(response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.text();
+        })
+        .then(function(html) {
+            if (target.dataset.source !== element.dataset.forecastUrl) {
+                return;
+            }
+            target.innerHTML = html;
+            target.classList.remove('forecast-hours-placeholder');
+        })
+        .catch(function() {
+            delete element.dataset.loaded; // Let user try again
+        });
+}
+
+// Next days: load hours when day is expanded for the first time
+document.querySelectorAll('details.forecast-day[data-forecast-url]').forEach(function(day) {
+    day.addEventListener('toggle', function() {
+        if (day.open) {
+            load_forecast(day);
+        }
+    });
+});
+
+// "Every hour" button replaces 3-hour forecast of the day with hourly one
+document.querySelectorAll('.forecast-hourly-btn').forEach(function(button) {
+    button.addEventListener('click', function() {
+        load_forecast(button);
+        button.hidden = true;
+    });
+});
@@ -0,0 +1,33 @@
+// Live current weather: server pushes changed fields whenever cached weather of the city is refreshed
+
+function set_live_value(block, name, value) {
+    block.querySelectorAll('[data-live="' + name + '"]').forEach(function(element) {
+        if (element.tagName === 'IMG') {
+            element.src = value;
+        } else {
+            element.textContent = value;
+        }
+    });
+}
+
+const live_block = document.querySelector('[data-live-url]');
+
+if (live_block && window.EventSource) {
+    const source = new EventSource(live_block.dataset.liveUrl);
+
+    source.addEventListener('current', function(event) {
+        const delta = JSON.parse(event.data);
+        if ('temp_c' in delta) {
+            set_live_value(live_block, 'temp', Math.round(delta.temp_c));
+        }
+        if ('condition_text' in delta) {
+            set_live_value(live_block, 'condition_text', delta.condition_text);
+            live_block.querySelector('[data-live="condition_icon"]').alt = delta.condition_text;
+        }
+        ['wind', 'humidity', 'condition_icon'].forEach(function(name) {
+            if (name in delta) {
+                set_live_value(live_block, name, delta[name]);
+            }
+        });
+    });
+}
@@ -0,0 +1,8 @@
+// Service worker (served from /sw.js, so it controls all pages) keeps static files, pages and forecasts for repeat and offline visits
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', function() {
+        navigator.serviceWorker.register('/sw.js').catch(function(error) {
+            console.log('Service worker registration failed:', error);
+        });
+    });
+}
@@ -0,0 +1,51 @@
+import os
+import re
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# Strings are matched first, so comment-like text inside them is kept as is
+CSS_TOKENS_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*[\s\S]*?\*/''')
+JS_TOKENS_RE = re.compile(r'''("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)|/\*[\s\S]*?\*/|//[^\n]*''')
+CSS_STRINGS_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+CSS_SPACES_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,])\s*')
+
+
+def strip_comments(source, tokens_re): # Remove comments, but keep strings untouched
+    return tokens_re.sub(lambda match: match.group(1) or '', source)
+
+
+def minify_css(source): # Remove comments and whitespace that does not change the meaning of stylesheet
+    parts = CSS_STRINGS_RE.split(strip_comments(source, CSS_TOKENS_RE))
+
+    for index in range(0, len(parts), 2): # split() returns code and strings alternately, strings are kept as is
+        part = CSS_SPACES_RE.sub(' ', parts[index])
+        part = CSS_PUNCTUATION_RE.sub(r'\1', part)
+        parts[index] = part.replace(': ', ':').replace(';}', '}')
+
+    return ''.join(parts).strip()
+
+
+def minify_js(source): # Conservative minification: only comments, indentation and empty lines, so automatic semicolon insertion still works
+    source = strip_comments(source, JS_TOKENS_RE)
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+class MinifiedCompressedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    # collectstatic pipeline: minify CSS/JS -> add content hash to file names and write staticfiles.json manifest ->
+    # pre-generate .gz and .br variants that WhiteNoise serves with far-future cache headers
+
+    def _save(self, name, content):
+        minifier = MINIFIERS.get(os.path.splitext(name)[1].lower())
+        if minifier:
+            content.seek(0)
+            content = ContentFile(minifier(content.read().decode('utf-8')).encode('utf-8'))
+        return super()._save(name, content)
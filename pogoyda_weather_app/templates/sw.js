@@ -0,0 +1,146 @@
+{% autoescape off %}// Service worker: static files from cache, pages and forecasts from cache at once with revalidation in background, stored copies also work offline
+const STATIC_CACHE = 'static-{{ version }}'; // Version changes with hashed names of static files, old files are deleted on activation
+const PAGES_CACHE = 'pages';
+const FORECASTS_CACHE = 'forecasts';
+const STATIC_PREFIX = {{ static_prefix }};
+const PRECACHE_URLS = {{ precache_urls }};
+const MAX_ENTRIES = 20; // Pages and forecasts of last visited cities
+const MAX_STALE_AGE = 3600 * 1000; // Older copy isn't shown before revalidation: its forecast days may be over. Offline it's still shown
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(caches.open(STATIC_CACHE).then(function(cache) {
+        return cache.addAll(PRECACHE_URLS);
+    }).then(function() {
+        return self.skipWaiting();
+    }));
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(caches.keys().then(function(names) {
+        return Promise.all(names.filter(function(name) {
+            return name.startsWith('static-') && name !== STATIC_CACHE;
+        }).map(function(name) {
+            return caches.delete(name);
+        }));
+    }).then(function() {
+        return self.clients.claim();
+    }));
+});
+
+function trim(cache) { // Keys are in insertion order, the oldest entries go first
+    return cache.keys().then(function(keys) {
+        return Promise.all(keys.slice(0, Math.max(keys.length - MAX_ENTRIES, 0)).map(function(key) {
+            return cache.delete(key);
+        }));
+    });
+}
+
+function store(cache, url, response) { // Copy keeps time server last confirmed it, a 304 makes it fresh again
+    return response.clone().blob().then(function(body) {
+        const headers = new Headers(response.headers);
+        headers.set('X-Stored-At', String(Date.now()));
+        return cache.put(url, new Response(body, {status: response.status, statusText: response.statusText, headers: headers}));
+    }).then(function() {
+        return trim(cache);
+    });
+}
+
+function isFresh(cached) {
+    return Date.now() - Number(cached.headers.get('X-Stored-At')) < MAX_STALE_AGE;
+}
+
+// Conditional GET with ETag of cached copy: when forecast didn't change, server answers 304 without rendering.
+// Only responses with ETag are stored: server adds it to pages of anonymous users and to public API, private pages aren't kept
+function revalidate(request, cacheName) {
+    return caches.open(cacheName).then(function(cache) {
+        return cache.match(request.url).then(function(cached) {
+            const headers = new Headers();
+            if (cached && cached.headers.get('ETag')) {
+                headers.set('If-None-Match', cached.headers.get('ETag'));
+            }
+            return fetch(request.url, {headers: headers, credentials: 'same-origin', cache: 'no-store', redirect: 'manual'})
+                .then(function(response) {
+                    if (response.status === 304 && cached) {
+                        return store(cache, request.url, cached).then(function() {
+                            return cached;
+                        });
+                    }
+                    if (response.ok && response.headers.get('ETag')) {
+                        return store(cache, request.url, response).then(function() {
+                            return response;
+                        });
+                    }
+                    if (response.ok && cached) { // Page became private, e.g. user logged in: anonymous copy mustn't be shown again
+                        return cache.delete(request.url).then(function() {
+                            return response;
+                        });
+                    }
+                    return response;
+                });
+        });
+    });
+}
+
+function fromCache(request, cacheName) {
+    return caches.open(cacheName).then(function(cache) {
+        return cache.match(request.url);
+    });
+}
+
+// Stale-while-revalidate: stored copy is shown at once, conditional GET in background updates it for the next view.
+// Without fresh copy the network answer is awaited, and stale copy is used when network is unavailable
+function staleWhileRevalidate(event, cacheName) {
+    const update = revalidate(event.request, cacheName);
+    event.waitUntil(update.catch(function() {}));
+    return fromCache(event.request, cacheName).then(function(cached) {
+        if (cached && isFresh(cached)) {
+            return cached;
+        }
+        return update.catch(function(error) {
+            if (cached) {
+                return cached;
+            }
+            throw error;
+        });
+    });
+}
+
+function offlinePage(request) { // Last copy of this page, or of main page, when network is unavailable
+    return fromCache(request, PAGES_CACHE).then(function(cached) {
+        return cached || fromCache(new Request('/'), PAGES_CACHE);
+    }).then(function(cached) {
+        return cached || new Response('Offline', {status: 503, headers: {'Content-Type': 'text/plain'}});
+    });
+}
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.method !== 'GET') { // Forms log in, change favorites and alerts: stored pages may not match any more
+        event.waitUntil(caches.delete(PAGES_CACHE));
+        return;
+    }
+
+    if (url.pathname.startsWith(STATIC_PREFIX)) { // Names contain content hash, cached copy is always valid
+        event.respondWith(caches.open(STATIC_CACHE).then(function(cache) {
+            return cache.match(request).then(function(cached) {
+                return cached || fetch(request).then(function(response) {
+                    if (response.ok) {
+                        cache.put(request, response.clone());
+                    }
+                    return response;
+                });
+            });
+        }));
+    } else if (url.pathname.startsWith('/api/forecast/')) {
+        event.respondWith(staleWhileRevalidate(event, FORECASTS_CACHE));
+    } else if (request.mode === 'navigate' || url.pathname.startsWith('/forecast/')) { // Repeat view of a city is rendered from stored copy
+        event.respondWith(staleWhileRevalidate(event, PAGES_CACHE).catch(function() {
+            return request.mode === 'navigate' ? offlinePage(request) : Response.error();
+        }));
+    }
+});
+{% endautoescape %}
@@ -0,0 +1,90 @@
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import redis
+import requests
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+CACHE_METHODS = ['get', 'set', 'add', 'incr', 'decr', 'delete', 'touch', 'has_key', 'get_many', 'set_many', 'delete_many']
+
+
+class OperationRecorder: # Records ORM queries, cache operations (Redis pipelines too) and outbound HTTP requests made inside `with` block
+    def __init__(self, cache_alias='default'):
+        self.cache_alias = cache_alias
+        self.queries = []
+        self.cache_ops = []
+        self.http_calls = []
+        self.duration = 0.0
+
+    def wrap_cache_method(self, method_name, method):
+        recorder = self
+
+        def recorded(cache, key=None, *args, **kwargs):
+            keys = list(key) if isinstance(key, dict) else key # set_many gets dict, show only its keys
+            recorder.cache_ops.append(f'{method_name} {keys!r}')
+            return method(cache, key, *args, **kwargs)
+
+        return recorded
+
+    def wrap_pipeline_execute(self, execute): # Pipelined commands take one round trip, so they are one operation
+        recorder = self
+
+        def recorded(pipeline, *args, **kwargs):
+            recorder.cache_ops.append(f'pipeline {[command[0][0] for command in pipeline.command_stack]!r}')
+            return execute(pipeline, *args, **kwargs)
+
+        return recorded
+
+    def wrap_http_send(self, send):
+        recorder = self
+
+        def recorded(session, request, **kwargs):
+            recorder.http_calls.append(f'{request.method} {request.url}')
+            return send(session, request, **kwargs)
+
+        return recorded
+
+    @contextmanager
+    def record(self):
+        cache_class = type(caches[self.cache_alias])
+        patchers = [patch.object(cache_class, name, self.wrap_cache_method(name, getattr(cache_class, name))) for name in CACHE_METHODS]
+        patchers.append(patch.object(redis.client.Pipeline, 'execute', self.wrap_pipeline_execute(redis.client.Pipeline.execute)))
+        patchers.append(patch.object(requests.Session, 'send', self.wrap_http_send(requests.Session.send)))
+
+        for patcher in patchers:
+            patcher.start()
+        started = time.perf_counter()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                yield self
+        finally:
+            self.duration = time.perf_counter() - started
+            for patcher in reversed(patchers):
+                patcher.stop()
+        self.queries = [query['sql'] for query in queries.captured_queries]
+
+    def check_budget(self, queries=None, cache_ops=None, http_calls=None, seconds=None): # List of budget violations with offending operations
+        violations = []
+        for name, limit, operations in [('ORM queries', queries, self.queries), ('cache operations', cache_ops, self.cache_ops),
+                                        ('HTTP calls', http_calls, self.http_calls)]:
+            if limit is not None and len(operations) > limit:
+                listed = '\n'.join(f'    {index}. {operation}' for index, operation in enumerate(operations, 1))
+                violations.append(f'{name}: {len(operations)} > budget {limit}\n{listed}')
+        if seconds is not None and self.duration > seconds:
+            violations.append(f'duration: {self.duration:.3f}s > budget {seconds}s')
+        return violations
+
+
+class PerformanceBudgetMixin: # TestCase mixin: with self.assertBudget(queries=3, cache_ops=4, http_calls=0): self.client.get(...)
+
+    @contextmanager
+    def assertBudget(self, queries=None, cache_ops=None, http_calls=None, seconds=None):
+        recorder = OperationRecorder()
+        with recorder.record():
+            yield recorder
+        violations = recorder.check_budget(queries, cache_ops, http_calls, seconds)
+        if violations:
+            self.fail('Performance budget exceeded:\n' + '\n'.join(violations))
@@ -1,15 +1,80 @@
+import asyncio
+import json
+import os
 import re
-from datetime import datetime, timedelta
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
 from unittest.mock import patch
 
 import jwt
-from django.test import TestCase
-
+import requests
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache.backends.redis import RedisSerializer
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import get_resolver
+from prometheus_client import REGISTRY
+
+from benchmarks.load import percentile
+from benchmarks.run import compare_with_baseline, wait_for_server
+from benchmarks.stub_server import start_stub_server
 from pogoyda_weather import settings
-from pogoyda_weather_app.models import CustomUser, FavoriteLocation
+from pogoyda_weather_app import autocomplete, icons
+from pogoyda_weather_app.alerts import evaluate_alerts
+from pogoyda_weather_app.autocomplete import CityIndex, normalize_city
+from pogoyda_weather_app.cache_backend import get_health, get_redis
+from pogoyda_weather_app.cache_serializer import CompactSerializer, zstandard
+from pogoyda_weather_app.checks import check_compiled_translations
+from pogoyda_weather_app.digest import send_digests
+from pogoyda_weather_app.geohash import encode_geohash
+from pogoyda_weather_app.live import live_updates, publish_update
+from pogoyda_weather_app.models import CustomUser, FavoriteLocation, ForecastObservation, WeatherAlert
+from pogoyda_weather_app.profiling import list_profiles, read_stacks
+from pogoyda_weather_app.storage import minify_css, minify_js
+from pogoyda_weather_app.redis_batch import RedisBatch
+from pogoyda_weather_app.providers import CityNotFound, OpenMeteoProvider, RecordingProvider, WeatherAPIProvider
+from pogoyda_weather_app.sample_data import make_forecast_response
+from pogoyda_weather_app.testing import PerformanceBudgetMixin
+from pogoyda_weather_app.unknown_cities import BloomFilter, unknown_cities
+from pogoyda_weather_app.views import extract_forecast_data
+from pogoyda_weather_app.weather_cache import get_weather_data, get_weather_from_cache
 from django.core.cache import cache
 
 
+def make_weather_data(city='Moscow', country='Russia', last_updated_epoch=1760857200): # Fake weatherapi.com response for tests without network
+    forecast_days = []
+    for day in range(19, 22):
+        hours = [{
+            'time_epoch': 1760832000 + (day - 19) * 86400 + hour * 3600,
+            'time': f'2025-10-{day} {hour:02d}:00',
+            'temp_c': 10.0 + hour / 2,
+            'wind_kph': 14.4,
+            'wind_mph': 8.9,
+            'humidity': 70,
+            'condition': {'text': 'Partly cloudy', 'icon': '//cdn.weatherapi.com/weather/64x64/day/116.png', 'code': 1003},
+        } for hour in range(24)]
+        forecast_days.append({'date': f'2025-10-{day}', 'hour': hours})
+
+    return {
+        'location': {'name': city, 'region': city, 'country': country, 'lat': 55.75, 'lon': 37.62,
+                     'localtime': '2025-10-19 10:05', 'localtime_epoch': last_updated_epoch + 300},
+        'current': {'last_updated_epoch': last_updated_epoch, 'temp_c': 12.0, 'wind_kph': 14.4, 'wind_mph': 8.9,
+                    'humidity': 70, 'condition': {'text': 'Partly cloudy', 'icon': '//cdn.weatherapi.com/weather/64x64/day/116.png', 'code': 1003}},
+        'forecast': {'forecastday': forecast_days},
+    }
+
+
 class IndexTest(TestCase):
 
     @classmethod
@@ -63,6 +128,924 @@ class IndexTest(TestCase):
             cache.clear() # ratelimit keep count of requests in cache, that's why we clear cache to avoid errors.
 
 
+@patch('pogoyda_weather_app.views.get_user_city', return_value='Moscow')
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+class IndexCachingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_anonymous_index_returns_etag_and_last_modified(self, mock_weather, mock_city):
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_anonymous_index_returns_304_for_same_etag(self, mock_weather, mock_city):
+        response = self.client.get('/')
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_new_forecast_version_changes_etag(self, mock_weather, mock_city):
+        etag = self.client.get('/').headers['ETag']
+        cache.clear()
+        mock_weather.return_value = make_weather_data(last_updated_epoch=1760858100)
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_forecast_section_is_cached_per_city_and_language(self, mock_weather, mock_city):
+        self.client.get('/', HTTP_ACCEPT_LANGUAGE='en')
+        fragment_key = make_template_fragment_key('forecast_section', ['Moscow', 'Russia', 'en', 'en', '1760857200', 3, 3, False])
+        self.assertIsNotNone(cache.get(fragment_key))
+
+    def test_authenticated_index_has_no_etag(self, mock_weather, mock_city):
+        CustomUser.objects.create_user(username='testuser', email='test@test.com', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_anonymous_search_by_url_can_be_shared_by_proxy(self, mock_weather, mock_city):
+        response = self.client.get('/?city=Moscow')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies, {}) # Neither session nor CSRF cookie
+        self.assertNotIn('city', self.client.session)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('Accept-Language', response['Vary'])
+        self.assertIn('Cookie', response['Vary'])
+        mock_city.assert_not_called()
+
+        not_modified = self.client.get('/?city=Moscow', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('public', not_modified['Cache-Control'])
+
+    def test_language_is_negotiated_with_q_values(self, mock_weather, mock_city):
+        response = self.client.get('/?city=Moscow', HTTP_ACCEPT_LANGUAGE='fr-FR,fr;q=0.9,ru;q=0.8,en;q=0.5')
+        self.assertContains(response, 'км/ч')
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+class ApiForecastTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_forecast_returns_compact_json(self, mock_weather):
+        response = self.client.get('/api/forecast/Moscow/', {'lang': 'ru'})
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['location']['city'], 'Moscow')
+        self.assertEqual(data['current']['wind_unit'], 'км/ч')
+        self.assertEqual(len(data['forecast']), 3)
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_forecast_has_etag_and_max_age_of_remaining_cache_time(self, mock_weather):
+        response = self.client.get('/api/forecast/Moscow/')
+
+        self.assertTrue(response.headers['ETag'].startswith('"'))
+        max_age = int(re.search(r'max-age=(\d+)', response.headers['Cache-Control']).group(1))
+        self.assertTrue(0 < max_age <= 60)
+
+    def test_forecast_returns_304_for_same_etag(self, mock_weather):
+        etag = self.client.get('/api/forecast/Moscow/').headers['ETag']
+        response = self.client.get('/api/forecast/Moscow/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        mock_weather.assert_called_once()
+
+    def test_same_named_cities_of_different_countries_have_different_etags(self, mock_weather):
+        mock_weather.return_value = make_weather_data(city='Paris', country='France')
+        etag = self.client.get('/api/forecast/Paris/').headers['ETag']
+        cache.clear()
+        mock_weather.return_value = make_weather_data(city='Paris', country='United States of America')
+        response = self.client.get('/api/forecast/Paris/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_city_returns_404(self, mock_weather):
+        mock_weather.return_value = {'error_type': 'City_not_found', 'city': 'NonExistCity123'}
+        response = self.client.get('/api/forecast/NonExistCity123/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'city_not_found')
+
+    def test_forecast_horizon_and_step_are_request_parameters(self, mock_weather):
+        data = self.client.get('/api/forecast/Moscow/', {'days': 2, 'step': 1}).json()
+
+        self.assertEqual(len(data['forecast']), 2)
+        self.assertEqual(len(data['forecast'][0]['hours']), 24)
+
+
+@override_settings(INDEX_STREAMING=True)
+@patch('pogoyda_weather_app.views.get_user_city', return_value='Moscow')
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+class IndexStreamingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_page_shell_is_sent_before_forecast(self, mock_weather, mock_city):
+        response = self.client.get('/?city=Moscow')
+        chunks = list(response.streaming_content)
+
+        self.assertIn(b'css/styles.css', chunks[0])
+        self.assertNotIn(b'dynamic-block', chunks[0])
+        self.assertIn(b'Weather in', b''.join(chunks))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(self.client.get('/?city=Moscow').streaming) # Cached forecast is rendered at once
+
+    def test_session_is_saved_after_forecast_is_streamed(self, mock_weather, mock_city):
+        response = self.client.get('/')
+        b''.join(response.streaming_content)
+
+        self.assertEqual(self.client.session['city'], 'Moscow')
+
+    def test_weather_api_error_is_shown_in_place_of_forecast(self, mock_weather, mock_city):
+        mock_weather.return_value = {'error_type': 'API_error'}
+        response = self.client.get('/?city=Moscow')
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Service Unavailable', content)
+        self.assertIn(b'js/forecast.js', content) # Page is complete after error
+
+    def test_alert_errors_are_shown_once(self, mock_weather, mock_city):
+        user = CustomUser.objects.create_user(username='streamuser', email='stream@test.com', password='testpass123')
+        favorite = FavoriteLocation.objects.create(user=user, city='Moscow', country='Russia')
+        self.client.force_login(user)
+        self.client.post(f'/favorites/{favorite.id}/alerts/', {'metric': WeatherAlert.WIND_ABOVE}) # Threshold is missing
+
+        streamed = b''.join(self.client.get('/?city=Moscow').streaming_content).decode()
+        rendered = self.client.get('/?city=Moscow') # Forecast is cached now, page isn't streamed
+
+        self.assertIn('Set threshold for this alert.', streamed)
+        self.assertNotContains(rendered, 'Set threshold for this alert.')
+
+
+@patch('pogoyda_weather_app.views.get_user_city', return_value='Moscow')
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+class LazyForecastTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_index_renders_only_first_day_inline(self, mock_weather, mock_city):
+        response = self.client.get('/')
+
+        self.assertEqual(response.content.count(b'class="hour-slot"'), 8)
+        self.assertContains(response, '/forecast/Moscow/2025-10-20/?step=3')
+        self.assertContains(response, '/forecast/Moscow/2025-10-19/?step=1')
+
+    def test_index_horizon_is_limited_by_days_parameter(self, mock_weather, mock_city):
+        response = self.client.get('/', {'days': 1, 'step': 1})
+
+        self.assertEqual(response.content.count(b'class="hour-slot"'), 24)
+        self.assertNotContains(response, '/forecast/Moscow/2025-10-20/')
+
+    def test_day_fragment_is_served_from_same_cache_entry(self, mock_weather, mock_city):
+        self.client.get('/')
+        response = self.client.get('/forecast/Moscow/2025-10-21/', {'step': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'forecast_hours.html')
+        self.assertEqual(response.content.count(b'class="hour-slot"'), 24)
+        self.assertIn('max-age', response.headers['Cache-Control'])
+        mock_weather.assert_called_once()
+
+    def test_day_fragment_for_unknown_date_returns_404(self, mock_weather, mock_city):
+        response = self.client.get('/forecast/Moscow/2030-01-01/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_day_links_use_cache_entry_of_the_query(self, mock_weather, mock_city):
+        response = self.client.get('/', {'city': 'moscow'}) # Weather API answers with "Moscow"
+        self.assertContains(response, '/forecast/moscow/2025-10-20/?step=3')
+
+        self.assertEqual(self.client.get('/forecast/moscow/2025-10-20/').status_code, 200)
+        mock_weather.assert_called_once()
+
+    def test_day_fragment_of_uncached_city_never_calls_weather_api(self, mock_weather, mock_city):
+        response = self.client.get('/forecast/Paris/2025-10-20/')
+
+        self.assertEqual(response.status_code, 404)
+        mock_weather.assert_not_called()
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+class ForecastHistoryTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_nothing_is_recorded_when_history_is_disabled(self, mock_weather):
+        self.client.get('/api/forecast/Moscow/')
+        self.assertFalse(ForecastObservation.objects.exists())
+
+    @override_settings(FORECAST_HISTORY_ENABLED=True)
+    def test_fetched_weather_is_recorded_once_per_hour(self, mock_weather):
+        self.client.get('/api/forecast/Moscow/')
+        cache.clear()
+        self.client.get('/api/forecast/Moscow/')
+
+        self.assertEqual(ForecastObservation.objects.filter(kind=ForecastObservation.CURRENT).count(), 1)
+        self.assertEqual(ForecastObservation.objects.filter(kind=ForecastObservation.HOURLY).count(), 72)
+
+    @override_settings(FORECAST_HISTORY_ENABLED=True)
+    def test_history_api_is_served_from_database(self, mock_weather):
+        self.client.get('/api/forecast/Moscow/')
+        mock_weather.reset_mock()
+
+        with patch('pogoyda_weather_app.history.timezone.now', return_value=datetime(2025, 10, 20, 12, tzinfo=timezone.utc)):
+            data = self.client.get('/api/history/moscow/', {'days': 1}).json()
+
+        mock_weather.assert_not_called()
+        self.assertEqual(data['days'], 1)
+        self.assertEqual(data['observations'][0]['kind'], 'hourly')
+        self.assertEqual(len([row for row in data['observations'] if row['kind'] == 'hourly']), 25)
+
+    @override_settings(FORECAST_HISTORY_ENABLED=True)
+    def test_prune_command_downsamples_and_deletes_old_data(self, mock_weather):
+        self.client.get('/api/forecast/Moscow/')
+
+        with patch('pogoyda_weather_app.history.timezone.now', return_value=datetime(2025, 10, 23, 12, tzinfo=timezone.utc)):
+            call_command('prune_forecast_history', '--downsample-after', '2', '--retention', '3', stdout=StringIO())
+
+        daily = ForecastObservation.objects.filter(kind=ForecastObservation.DAILY)
+        self.assertEqual([row.observed_at.day for row in daily.order_by('observed_at')], [20])
+        self.assertEqual(daily.get().temp_c, 18.8) # Average of 12:00-23:00, earlier hours are past retention
+        self.assertEqual(ForecastObservation.objects.filter(kind=ForecastObservation.HOURLY).count(), 24)
+
+
+class AutocompleteTest(PerformanceBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_normalization_ignores_case_accents_and_separators(self):
+        self.assertEqual(normalize_city('São  Paulo'), 'sao paulo')
+        self.assertEqual(normalize_city('Орёл'), normalize_city('орел'))
+        self.assertEqual(normalize_city('Rostov-on-Don'), 'rostov on don')
+
+    def test_suggestions_for_latin_and_cyrillic_prefixes(self):
+        index = autocomplete.get_city_index()
+
+        self.assertIn({'city': 'Moscow', 'country': 'Russia'}, index.suggest('mos'))
+        self.assertEqual(index.suggest('моск')[0], {'city': 'Москва', 'country': 'Россия'})
+        self.assertEqual(index.suggest('санкт петер')[0]['city'], 'Санкт-Петербург')
+        self.assertEqual(index.suggest('zzzz'), [])
+        self.assertEqual(len(index.suggest('s', limit=5)), 5)
+
+    def test_suggestions_take_less_than_millisecond(self):
+        index = autocomplete.get_city_index()
+        started = time.perf_counter()
+        for query in ['mo', 'lon', 'new y', 'санкт', 'ека'] * 200:
+            index.suggest(query)
+        self.assertLess((time.perf_counter() - started) / 1000, 0.001)
+
+    def test_autocomplete_endpoint_makes_no_queries_or_upstream_calls(self):
+        with self.assertBudget(queries=0, cache_ops=1, http_calls=0):
+            response = self.client.get('/api/autocomplete/', {'q': 'Lond'})
+
+        self.assertEqual(response.json()['suggestions'][0], {'city': 'London', 'country': 'United Kingdom'})
+        self.assertIn('max-age', response.headers['Cache-Control'])
+
+    @patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data(city='Pogoydino', country='Russia'))
+    def test_resolved_cities_are_added_to_index_and_shared(self, mock_weather):
+        self.client.get('/api/forecast/Pogoydino/')
+
+        self.assertEqual(autocomplete.get_city_index().suggest('pogoyd'), [{'city': 'Pogoydino', 'country': 'Russia'}])
+        self.assertIn(['Pogoydino', 'Russia'], autocomplete.get_resolved_cities())
+
+        other_process_index = CityIndex()
+        with patch.object(autocomplete, 'city_index', other_process_index), patch.object(autocomplete, 'last_sync', 0.0):
+            self.assertEqual(len(autocomplete.get_city_index().suggest('pogoyd')), 1)
+
+    def test_concurrently_resolved_cities_are_all_shared(self):
+        cities = [f'Pogoyda {number}' for number in range(50)]
+        def resolve_and_search(city): # Searches run while other threads add cities
+            autocomplete.remember_city(city, 'Russia')
+            return autocomplete.city_index.similar(city)
+
+        with patch.object(autocomplete, 'city_index', CityIndex()), ThreadPoolExecutor(8) as executor:
+            list(executor.map(resolve_and_search, cities))
+
+        self.assertEqual(sorted(city for city, _ in autocomplete.get_resolved_cities()), sorted(cities))
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value={'error_type': 'City_not_found', 'city': 'Moskvaa'})
+class UnknownCitiesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_bloom_filter_has_no_false_negatives_and_few_false_positives(self, mock_weather):
+        bloom_filter = BloomFilter('test_bloom', capacity=1000, error_rate=0.01)
+        pipeline = get_redis().pipeline()
+        for index in range(1000):
+            bloom_filter.add(f'city-{index}', pipeline, ttl=60)
+        pipeline.execute()
+
+        def contains(item):
+            pipeline = get_redis().pipeline()
+            bloom_filter.check(item, pipeline)
+            return all(pipeline.execute())
+
+        self.assertTrue(all(contains(f'city-{index}') for index in range(1000)))
+        self.assertLess(sum(contains(f'other-{index}') for index in range(1000)), 30)
+
+    def test_unknown_city_is_not_sent_to_weather_api_again(self, mock_weather):
+        self.client.get('/api/forecast/Moskvaa/')
+        response = self.client.get('/api/forecast/MOSKVAA/')
+
+        self.assertEqual(response.status_code, 404)
+        mock_weather.assert_called_once()
+        self.assertIsNone(cache.get('Moskvaa')) # No cache key per wrong query
+
+    def test_known_city_is_never_blocked(self, mock_weather):
+        unknown_cities.add('Moscow')
+        mock_weather.return_value = make_weather_data()
+
+        response = self.client.get('/api/forecast/Moscow/')
+
+        self.assertEqual(response.status_code, 200)
+        mock_weather.assert_called_once()
+
+    def test_similar_cities_for_typos(self, mock_weather):
+        index = autocomplete.get_city_index()
+
+        self.assertEqual(index.similar('Moscw')[0], {'city': 'Moscow', 'country': 'Russia'})
+        self.assertEqual(index.similar('Санкт Петербур')[0]['city'], 'Санкт-Петербург')
+        self.assertEqual(index.similar('Xyzqw'), [])
+
+    def test_incorrect_city_page_offers_suggestions(self, mock_weather):
+        response = self.client.get('/incorrect_city/Londn')
+
+        self.assertContains(response, 'London, United Kingdom')
+        mock_weather.assert_not_called()
+
+
+@override_settings(WEATHER_GEOHASH_PRECISION=5)
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', side_effect=lambda city: make_weather_data(city=city))
+class GeohashCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_encode_geohash(self, mock_weather):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(55.75, 37.62, 5), 'ucfv0')
+
+    def test_nearby_city_uses_forecast_fetched_for_another_city(self, mock_weather):
+        self.client.get('/api/forecast/Moscow/')
+        self.client.get('/api/forecast/Khimki/') # First request for a city resolves its coordinates
+        cache.delete('geohash:ucfv0')
+        self.client.get('/api/forecast/Moscow/')
+        shared_hits = REGISTRY.get_sample_value('pogoyda_geohash_shared_hits_total')
+
+        response = self.client.get('/api/forecast/Khimki/')
+
+        self.assertEqual(response.json()['location']['city'], 'Khimki')
+        self.assertEqual(mock_weather.call_count, 3)
+        self.assertEqual(REGISTRY.get_sample_value('pogoyda_geohash_shared_hits_total'), shared_hits + 1)
+
+    def test_errors_are_still_cached_under_city_name(self, mock_weather):
+        mock_weather.side_effect = None
+        mock_weather.return_value = {'error_type': 'API_error'}
+        self.client.get('/api/forecast/Moscow/')
+        response = self.client.get('/api/forecast/Moscow/')
+
+        self.assertEqual(response.status_code, 503)
+        mock_weather.assert_called_once()
+
+
+class CompactSerializerTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_forecast_round_trip_is_compressed(self):
+        serializer = CompactSerializer(compression='zlib', compress_min_size=1024)
+        weather_data = make_forecast_response()
+
+        data = serializer.dumps(weather_data)
+
+        self.assertEqual(data[0], 2)
+        self.assertLess(len(data), len(json.dumps(weather_data)) / 5)
+        self.assertEqual(serializer.loads(data), weather_data)
+
+    def test_small_values_and_other_types(self):
+        serializer = CompactSerializer(compress_min_size=1024)
+        moment = datetime(2025, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+        self.assertEqual(serializer.dumps(5), 5)
+        self.assertEqual(serializer.dumps('API_error'), b'\x01"API_error"')
+        self.assertEqual(serializer.loads(serializer.dumps({'at': moment})), {'at': moment})
+        self.assertEqual(serializer.loads(serializer.dumps(2 ** 70)), 2 ** 70)
+
+    def test_legacy_pickles_are_read_and_unknown_formats_are_misses(self):
+        serializer = CompactSerializer()
+
+        self.assertEqual(serializer.loads(RedisSerializer().dumps({'city': 'Moscow'})), {'city': 'Moscow'})
+        self.assertIsNone(serializer.loads(b'\x7fnewer format'))
+
+    @skipUnless(zstandard, 'zstandard is not installed')
+    def test_zstd_is_safe_to_use_from_worker_threads(self):
+        serializer = CompactSerializer(compression='zstd', compress_min_size=1024)
+        forecasts = [make_forecast_response(city=f'City {number}') for number in range(32)]
+
+        with ThreadPoolExecutor(8) as executor:
+            loaded = list(executor.map(lambda forecast: serializer.loads(serializer.dumps(forecast)), forecasts))
+
+        self.assertEqual(loaded, forecasts)
+
+    def test_cache_uses_serializer(self):
+        cache.set('counter', 1)
+        cache.incr('counter')
+        cache.set('forecast', make_forecast_response())
+
+        self.assertEqual(cache.get('counter'), 2)
+        self.assertEqual(cache.get('forecast'), make_forecast_response())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        with override_settings(WEATHER_REPLAY_DIR=tempfile.mkdtemp()):
+            call_command('benchmark_cache_serializer', iterations=1, stdout=out)
+
+        self.assertIn('json + zlib', out.getvalue())
+
+
+UNREACHABLE_REDIS = {'default': {
+    'BACKEND': 'pogoyda_weather_app.cache_backend.ResilientRedisCache',
+    'LOCATION': 'redis://127.0.0.1:1', # Nothing listens there, connection is refused at once
+    'OPTIONS': settings.CACHES['default']['OPTIONS'],
+}}
+
+
+@patch('pogoyda_weather_app.views.get_user_city', return_value='Moscow')
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', side_effect=lambda city: make_weather_data(city=city))
+class RedisFallbackTest(TestCase):
+
+    def setUp(self):
+        get_health('redis://127.0.0.1:1').recovered()
+
+    def test_cache_falls_back_to_local_memory_and_backs_off(self, mock_weather, mock_city):
+        with override_settings(CACHES=UNREACHABLE_REDIS):
+            fallbacks = REGISTRY.get_sample_value('pogoyda_redis_fallbacks_total', {'operation': 'get'}) or 0
+            cache.set('fallback', 'value', 60)
+
+            self.assertEqual(cache.get('fallback'), 'value')
+            self.assertFalse(cache.redis_available())
+            self.assertEqual(REGISTRY.get_sample_value('pogoyda_redis_fallbacks_total', {'operation': 'get'}), fallbacks + 1)
+
+    def test_cache_returns_to_redis_after_backoff(self, mock_weather, mock_city):
+        cache.report_failure(ConnectionError('restarting'))
+        self.assertFalse(cache.redis_available())
+        cache.health.retry_at = 0.0 # Backoff is over
+
+        cache.set('after_backoff', 'value', 60)
+
+        self.assertTrue(cache.redis_available())
+        self.assertEqual(cache.health.failures, 0)
+        self.assertEqual(get_redis().exists(cache.make_and_validate_key('after_backoff')), 1)
+        cache.delete('after_backoff')
+
+    def test_site_works_without_redis(self, mock_weather, mock_city):
+        with override_settings(CACHES=UNREACHABLE_REDIS):
+            first = self.client.get('/')
+            second = self.client.get('/api/forecast/Moscow/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        mock_weather.assert_called_once() # Second request is served from local cache
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', side_effect=lambda city: make_weather_data(city=city))
+class LiveWeatherTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    async def read_event(self, stream):
+        return await asyncio.wait_for(anext(stream), 5)
+
+    async def test_refreshed_weather_is_pushed_as_delta(self, mock_weather):
+        weather_data = make_weather_data()
+        await sync_to_async(cache.set)('Moscow', weather_data, 60)
+        response = await self.async_client.get('/live/Moscow/')
+        stream = aiter(response.streaming_content)
+
+        self.assertEqual(await self.read_event(stream), b'retry: 10000\n\n')
+        await sync_to_async(publish_update)('Moscow', weather_data)
+        first = await self.read_event(stream)
+        weather_data['current']['humidity'] = 40
+        await sync_to_async(publish_update)('Moscow', weather_data)
+        second = await self.read_event(stream)
+        reading = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0.1)
+        reading.cancel() # Client disconnected, ASGI handler cancels the stream
+        with self.assertRaises(asyncio.CancelledError):
+            await reading
+
+        self.assertIn(b'event: current', first)
+        self.assertIn(b'"condition_text": "Partly cloudy"', first)
+        self.assertEqual(second, b'event: current\ndata: {"humidity": 40}\n\n')
+        self.assertEqual(live_updates.queues, {})
+
+    async def test_page_watches_cache_entry_it_was_rendered_from(self, mock_weather):
+        mock_weather.side_effect, mock_weather.return_value = None, make_weather_data()
+        page = await self.async_client.get('/', {'city': 'moscow'}) # Weather API answers with "Moscow"
+        self.assertContains(page, 'data-live-url="/live/moscow/"')
+
+        response = await self.async_client.get('/live/moscow/')
+        stream = aiter(response.streaming_content)
+        await self.read_event(stream)
+        await sync_to_async(cache.delete)('moscow')
+        await sync_to_async(get_weather_from_cache)('moscow') # Refresh of expired entry, as keep_fresh() does it
+        update = await self.read_event(stream)
+        reading = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0.1)
+        reading.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reading
+
+        self.assertIn(b'event: current', update)
+
+    async def test_only_cached_cities_can_be_watched(self, mock_weather):
+        response = await self.async_client.get('/live/Moscow/')
+
+        self.assertEqual(response.status_code, 404)
+        mock_weather.assert_not_called()
+
+    def test_wsgi_clients_are_told_to_stop_reconnecting(self, mock_weather):
+        self.assertEqual(self.client.get('/live/Moscow/').status_code, 204)
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', side_effect=lambda city: make_weather_data(city=city))
+class WeatherAlertsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='alertuser', email='alert@test.com', password='testpass123')
+        cls.other = CustomUser.objects.create_user(username='otheruser', email='other@test.com', password='testpass123')
+        cls.favorite = FavoriteLocation.objects.create(user=cls.user, city='Moscow', country='Russia')
+        other_favorite = FavoriteLocation.objects.create(user=cls.other, city='Moscow', country='Russia')
+        # Forecast of the next 24 hours: temperature from 10 to 21.5, wind 14.4 km/h, no rain
+        WeatherAlert.objects.bulk_create([
+            WeatherAlert(favorite=cls.favorite, metric=WeatherAlert.TEMP_BELOW, threshold=11),
+            WeatherAlert(favorite=cls.favorite, metric=WeatherAlert.TEMP_BELOW, threshold=10),
+            WeatherAlert(favorite=cls.favorite, metric=WeatherAlert.WIND_ABOVE, threshold=14.4),
+            WeatherAlert(favorite=other_favorite, metric=WeatherAlert.WIND_ABOVE, threshold=14),
+            WeatherAlert(favorite=other_favorite, metric=WeatherAlert.RAIN),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_rules_of_city_are_evaluated_with_one_fetch(self, mock_weather):
+        out = StringIO()
+        call_command('evaluate_weather_alerts', stdout=out)
+
+        mock_weather.assert_called_once_with('Moscow')
+        self.assertIn('Checked 5 rules in 1 cities', out.getvalue())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['alert@test.com', 'other@test.com'])
+        self.assertIn('temperature will drop to 10°C (your alert: below 11°C)', mail.outbox[0].body + mail.outbox[1].body)
+        self.assertEqual(WeatherAlert.objects.filter(last_notified_at__isnull=False).count(), 2)
+
+    def test_fired_rules_are_silent_during_cooldown(self, mock_weather):
+        evaluate_alerts()
+
+        self.assertEqual(evaluate_alerts()['fired'], 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_user_manages_alerts_of_favorite_city(self, mock_weather):
+        self.client.force_login(self.user)
+        self.client.post(f'/favorites/{self.favorite.id}/alerts/', {'metric': WeatherAlert.RAIN})
+        self.client.post(f'/favorites/{self.favorite.id}/alerts/', {'metric': WeatherAlert.WIND_ABOVE}) # Threshold is missing
+        alert = self.favorite.alerts.get(metric=WeatherAlert.RAIN)
+        session = self.client.session
+        session.update({'city': 'Moscow'})
+        session.save()
+
+        response = self.client.get('/')
+        self.client.post(f'/alerts/{alert.id}/delete/')
+
+        self.assertContains(response, 'Set threshold for this alert.')
+        self.assertContains(response, f'/alerts/{alert.id}/delete/')
+        self.assertFalse(WeatherAlert.objects.filter(id=alert.id).exists())
+
+    def test_alerts_show_only_their_own_messages(self, mock_weather):
+        token = make_token(email='alert@test.com', username='alertuser')
+        self.client.post(f'/recovery_account/{token}/', {'password1': 'newpass', 'password2': 'newpass'})
+        session = self.client.session
+        session.update({'city': 'Moscow'})
+        session.save()
+
+        response = self.client.get('/')
+
+        self.assertNotContains(response, 'Password successfully changed!')
+        self.assertContains(self.client.get(f'/recovery_account/{token}/'), 'Password successfully changed!')
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', side_effect=lambda city: make_weather_data(city=city))
+class ForecastDigestTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name, cities in [('first', ['Moscow', 'Kazan']), ('second', ['Moscow']), ('third', ['Kazan'])]:
+            user = CustomUser.objects.create_user(username=name, email=f'{name}@test.com', password='testpass123', forecast_digest=True)
+            FavoriteLocation.objects.bulk_create([FavoriteLocation(user=user, city=city, country='Russia') for city in cities])
+        CustomUser.objects.create_user(username='unsubscribed', email='unsubscribed@test.com', password='testpass123')
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cities_are_fetched_once_and_emails_share_connection(self, mock_weather):
+        with patch('django.core.mail.backends.locmem.EmailBackend.open') as mock_open:
+            call_command('send_forecast_digest', chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(sorted(call.args[0] for call in mock_weather.call_args_list), ['Kazan', 'Moscow'])
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['first@test.com', 'second@test.com', 'third@test.com'])
+        self.assertEqual(mock_open.call_count, 1)
+        first = next(message for message in mail.outbox if message.to == ['first@test.com'])
+        self.assertIn('Moscow, Russia', first.body)
+        self.assertIn('Kazan, Russia', first.body)
+        self.assertIn('10…22°C', first.body)
+
+    def test_rerun_sends_only_to_users_left_by_interrupted_run(self, mock_weather):
+        send_digests(date(2025, 10, 19))
+        CustomUser.objects.filter(username='third').update(forecast_digest_sent_on=None) # Run stopped before the last chunk
+        mail.outbox = []
+
+        self.assertEqual(send_digests(date(2025, 10, 19)), 1)
+        self.assertEqual(mail.outbox[0].to, ['third@test.com'])
+
+    def test_user_toggles_subscription(self, mock_weather):
+        user = CustomUser.objects.get(username='unsubscribed')
+        self.client.force_login(user)
+
+        self.client.post('/forecast_digest/', HTTP_ACCEPT_LANGUAGE='ru')
+
+        user.refresh_from_db()
+        self.assertTrue(user.forecast_digest)
+        self.assertEqual(user.forecast_digest_language, 'ru')
+
+    def test_digest_is_written_in_language_of_subscription(self, mock_weather):
+        CustomUser.objects.filter(username='second').update(forecast_digest_language='ru')
+
+        send_digests(date(2025, 10, 19))
+
+        russian = next(message for message in mail.outbox if message.to == ['second@test.com'])
+        english = next(message for message in mail.outbox if message.to == ['third@test.com'])
+        self.assertEqual(russian.subject, 'Прогноз погоды на сегодня')
+        self.assertIn('Доброе утро, second!', russian.body)
+        self.assertIn('ветер до', russian.body)
+        self.assertEqual(english.subject, 'Weather forecast for today') # No stored language, LANGUAGE_CODE
+        self.assertIn('wind up to', english.body)
+
+
+def make_open_meteo_response(): # Forecast for 2 days in open-meteo.com format, Moscow time
+    hours = range(1760821200, 1760821200 + 48 * 3600, 3600)
+    return {
+        'utc_offset_seconds': 10800,
+        'timezone': 'Europe/Moscow',
+        'current': {'time': 1760857200, 'temperature_2m': 8.4, 'relative_humidity_2m': 81, 'wind_speed_10m': 16.1,
+                    'weather_code': 61, 'is_day': 1},
+        'hourly': {
+            'time': list(hours),
+            'temperature_2m': [5.0 + index % 24 / 4 for index in range(48)],
+            'relative_humidity_2m': [80] * 48,
+            'wind_speed_10m': [12.0] * 48,
+            'weather_code': [3] * 48,
+            'is_day': [0] * 8 + [1] * 10 + [0] * 30,
+        },
+    }
+
+
+class WeatherProvidersTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.replay_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        cache.clear()
+        shutil.rmtree(self.replay_dir, ignore_errors=True)
+
+    def mock_response(self, data, status_code=200):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(data).encode()
+        return response
+
+    @patch('pogoyda_weather_app.providers.requests.get')
+    def test_weather_api_is_asked_for_longest_horizon(self, mock_get):
+        mock_get.return_value = self.mock_response(make_weather_data())
+        get_weather_data('Moscow')
+
+        self.assertEqual(mock_get.call_args.kwargs['params']['days'], settings.FORECAST_MAX_DAYS)
+
+    @patch('pogoyda_weather_app.providers.requests.get')
+    def test_weather_api_response_is_reduced_to_internal_model(self, mock_get):
+        mock_get.return_value = self.mock_response(make_forecast_response())
+        data = WeatherAPIProvider().get_forecast('Moscow', 3, timeout=1)
+
+        self.assertEqual(set(data['current']), {'last_updated_epoch', 'temp_c', 'wind_kph', 'wind_mph', 'humidity', 'condition'})
+        self.assertNotIn('chance_of_rain', data['forecast']['forecastday'][0]['hour'][0])
+        self.assertEqual(extract_forecast_data(data, 'en')['location']['city'], 'Moscow')
+
+    @patch('pogoyda_weather_app.providers.requests.get')
+    def test_open_meteo_response_is_converted_to_internal_model(self, mock_get):
+        mock_get.side_effect = [
+            self.mock_response({'results': [{'name': 'Moscow', 'admin1': 'Moscow', 'country': 'Russia', 'latitude': 55.75, 'longitude': 37.62}]}),
+            self.mock_response(make_open_meteo_response()),
+        ]
+        data = OpenMeteoProvider().get_forecast('Moscow', 2, timeout=1)
+        forecast = extract_forecast_data(data, 'ru')
+
+        self.assertEqual(data['location']['localtime'], '2025-10-19 10:00')
+        self.assertEqual(data['current']['condition']['code'], 1183)
+        self.assertEqual([day['date'] for day in forecast['forecast_by_days']], ['2025-10-19', '2025-10-20'])
+        self.assertEqual(forecast['forecast_by_days'][0]['hours'][0]['time'], '01:00')
+        self.assertEqual(len(forecast['forecast_by_days'][0]['hours']), 8)
+
+    @patch('pogoyda_weather_app.providers.requests.get')
+    def test_open_meteo_unknown_city(self, mock_get):
+        mock_get.return_value = self.mock_response({'generationtime_ms': 0.5})
+        with self.assertRaises(CityNotFound):
+            OpenMeteoProvider().get_forecast('Moskvaa', 3, timeout=1)
+
+    @patch('pogoyda_weather_app.providers.requests.get')
+    def test_recorded_responses_are_replayed_without_network(self, mock_get):
+        mock_get.return_value = self.mock_response(make_forecast_response())
+        recorded = RecordingProvider(WeatherAPIProvider(), self.replay_dir).get_forecast('Moscow', 3, timeout=1)
+        mock_get.return_value = self.mock_response({'error': {'code': 1006, 'message': 'No matching location found.'}}, 400)
+        with self.assertRaises(CityNotFound):
+            RecordingProvider(WeatherAPIProvider(), self.replay_dir).get_forecast('Moskvaa', 3, timeout=1)
+        mock_get.reset_mock()
+
+        with self.settings(WEATHER_PROVIDERS=['replay'], WEATHER_REPLAY_DIR=self.replay_dir):
+            self.assertEqual(get_weather_data('moscow'), recorded)
+            self.assertEqual(get_weather_data('Moskvaa')['error_type'], 'City_not_found')
+        mock_get.assert_not_called()
+
+    @patch('pogoyda_weather_app.providers.requests.get')
+    def test_failover_when_primary_is_out_of_quota(self, mock_get):
+        mock_get.return_value = self.mock_response({'error': {'code': 2007, 'message': 'API key has exceeded calls per month quota.'}}, 403)
+        (self.replay_dir / 'moscow.json').write_text(json.dumps(make_forecast_response()))
+
+        with self.settings(WEATHER_PROVIDERS=['weatherapi', 'replay'], WEATHER_REPLAY_DIR=self.replay_dir):
+            self.assertEqual(get_weather_data('Moscow')['location']['name'], 'Moscow')
+            self.assertEqual(get_weather_data('Moscow')['location']['name'], 'Moscow')
+
+        mock_get.assert_called_once() # Provider without quota is skipped until the pause ends
+
+    @patch('pogoyda_weather_app.providers.requests.get', side_effect=requests.exceptions.Timeout)
+    def test_failover_when_primary_is_slow(self, mock_get):
+        (self.replay_dir / 'moscow.json').write_text(json.dumps(make_forecast_response()))
+
+        with self.settings(WEATHER_PROVIDERS=['weatherapi', 'replay'], WEATHER_REPLAY_DIR=self.replay_dir,
+                           WEATHER_PROVIDER_FAILOVER_TIMEOUT=0.5):
+            self.assertEqual(get_weather_data('Moscow')['location']['name'], 'Moscow')
+
+        self.assertEqual(mock_get.call_args.kwargs['timeout'], 0.5)
+        with self.settings(WEATHER_PROVIDERS=['weatherapi']):
+            self.assertEqual(get_weather_data('Moscow')['error_type'], 'API_timeout')
+
+
+@override_settings(STORAGES=dict(settings.STORAGES, staticfiles={'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}))
+class ConditionIconsTest(TestCase):
+
+    def setUp(self):
+        self.icons_root = Path(tempfile.mkdtemp())
+        icons.icon_urls.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.icons_root)
+        icons.icon_urls.clear()
+
+    def mock_response(self, content):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = content
+        return response
+
+    @patch('pogoyda_weather_app.management.commands.mirror_condition_icons.requests.Session.get')
+    @patch('pogoyda_weather_app.management.commands.mirror_condition_icons.requests.get')
+    def test_mirrored_icons_replace_cdn_urls(self, mock_get, mock_session_get):
+        mock_get.return_value = self.mock_response(json.dumps([{'code': 1000, 'day': 'Sunny', 'night': 'Clear', 'icon': 113},
+                                                               {'code': 1003, 'day': 'Partly cloudy', 'night': 'Partly cloudy', 'icon': 116}]).encode())
+        mock_session_get.return_value = self.mock_response(b'png')
+
+        with self.settings(CONDITION_ICONS_ROOT=self.icons_root):
+            call_command('mirror_condition_icons', stdout=StringIO())
+            call_command('mirror_condition_icons', stdout=StringIO()) # Mirrored icons aren't downloaded again
+            (self.icons_root / 'images/conditions/day/116.png').unlink()
+            forecast = extract_forecast_data(make_forecast_response(), 'en')
+
+        self.assertEqual(mock_session_get.call_count, 4)
+        self.assertEqual((self.icons_root / 'images/conditions/night/113.png').read_bytes(), b'png')
+        icons = {hour['condition_text']: hour['condition_icon'] for day in forecast['forecast_by_days'] for hour in day['hours']}
+        self.assertEqual(icons['Sunny'], '/static/images/conditions/day/113.png')
+        self.assertEqual(icons['Partly cloudy'], '//cdn.weatherapi.com/weather/64x64/day/116.png') # Not mirrored, still from CDN
+
+    def test_icons_mirrored_after_collectstatic_are_loaded_from_cdn(self):
+        icon = self.icons_root / 'images/conditions/day/113.png'
+        icon.parent.mkdir(parents=True)
+        icon.write_bytes(b'png')
+        static_root = Path(tempfile.mkdtemp())
+        (static_root / 'staticfiles.json').write_text(json.dumps({'paths': {}, 'version': '1.1', 'hash': ''}))
+        storages = dict(settings.STORAGES, staticfiles={'BACKEND': 'pogoyda_weather_app.storage.MinifiedCompressedManifestStaticFilesStorage'})
+
+        with self.settings(CONDITION_ICONS_ROOT=self.icons_root, STATIC_ROOT=static_root, STORAGES=storages):
+            icon_url = icons.get_local_icon_url('//cdn.weatherapi.com/weather/64x64/day/113.png')
+        shutil.rmtree(static_root)
+
+        self.assertEqual(icon_url, '//cdn.weatherapi.com/weather/64x64/day/113.png')
+        self.assertIsNone(icons.icon_urls['images/conditions/day/113.png'][0]) # Checked again later, after next collectstatic
+
+
+@patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_metric(self, text, name): # Value of metric line from Prometheus text format
+        match = re.search(rf'^{re.escape(name)} (\S+)$', text, re.MULTILINE)
+        return float(match.group(1)) if match else 0.0
+
+    def test_metrics_endpoint_exposes_cache_and_span_metrics(self, mock_weather):
+        before = self.client.get('/metrics').content.decode()
+        self.client.get('/api/forecast/Moscow/')
+        self.client.get('/api/forecast/Moscow/')
+        response = self.client.get('/metrics')
+        after = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        for result in ['hit', 'miss']:
+            name = f'pogoyda_cache_requests_total{{result="{result}",tier="redis"}}'
+            self.assertEqual(self.get_metric(after, name) - self.get_metric(before, name), 1)
+        self.assertIn('pogoyda_span_duration_seconds_count{span="redis"}', after)
+        self.assertIn('pogoyda_request_duration_seconds_count{method="GET",status="200",view="api_forecast"}', after)
+
+    def test_rate_limit_rejections_are_counted(self, mock_weather):
+        name = 'pogoyda_ratelimit_rejections_total{view="custom_logout"}'
+        before = self.get_metric(self.client.get('/metrics').content.decode(), name)
+        for i in range(11):
+            self.client.get('/logout/')
+
+        after = self.get_metric(self.client.get('/metrics').content.decode(), name)
+        self.assertEqual(after - before, 1)
+
+    def test_metrics_forbidden_for_other_addresses(self, mock_weather):
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 403)
+
+
 class CustomLoginTest(TestCase):
 
     @classmethod
@@ -397,3 +1380,340 @@ class TestCreateFavoriteLocations(TestCase):
         self.assertRedirects(response, '/')
         self.assertEqual(FavoriteLocation.objects.count(), 0)
 
+
+
+class TestTranslationCatalogCheck(TestCase):
+
+    def setUp(self):
+        self.locale_dir = Path(tempfile.mkdtemp())
+        shutil.copytree(Path(settings.BASE_DIR) / 'locale', self.locale_dir, dirs_exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.locale_dir)
+
+    def test_compiled_catalogs_are_up_to_date(self):
+        self.assertEqual(check_compiled_translations(None), [])
+
+    def test_missing_mo_file_is_error(self):
+        (self.locale_dir / 'ru' / 'LC_MESSAGES' / 'django.mo').unlink()
+
+        with override_settings(LOCALE_PATHS=[self.locale_dir]):
+            errors = check_compiled_translations(None)
+
+        self.assertEqual([error.id for error in errors], ['pogoyda_weather_app.E001'])
+
+    def test_new_translation_without_compilation_is_warning(self):
+        with open(self.locale_dir / 'ru' / 'LC_MESSAGES' / 'django.po', 'a', encoding='utf-8') as po_file:
+            po_file.write('\nmsgid "Brand new message"\nmsgstr "Совсем новое сообщение"\n')
+
+        with override_settings(LOCALE_PATHS=[self.locale_dir]):
+            errors = check_compiled_translations(None)
+
+        self.assertEqual([error.id for error in errors], ['pogoyda_weather_app.W001'])
+
+
+class ProfilerTest(TestCase):
+
+    def setUp(self):
+        self.profiles_dir = tempfile.mkdtemp()
+        self.profiler_settings = self.settings(PROFILER_TOKEN='secret', PROFILER_DIR=self.profiles_dir, PROFILER_MAX_FILES=2,
+                                               PROFILER_INTERVAL=0.001)
+        self.profiler_settings.enable()
+
+    def tearDown(self):
+        self.profiler_settings.disable()
+        shutil.rmtree(self.profiles_dir)
+
+    @patch('pogoyda_weather_app.views.get_city_index', side_effect=lambda: time.sleep(0.05) or autocomplete.get_city_index())
+    def test_requests_with_token_are_profiled_into_bounded_ring(self, mock_index):
+        self.client.get('/api/autocomplete/', {'q': 'mos'}, HTTP_X_PROFILE='wrong')
+        response = self.client.get('/api/autocomplete/', {'q': 'mos'}, HTTP_X_PROFILE='sécret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list_profiles(self.profiles_dir), [])
+
+        for _ in range(3):
+            self.client.get('/api/autocomplete/', {'q': 'mos'}, HTTP_X_PROFILE='secret')
+
+        profiles = list_profiles(self.profiles_dir)
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0]['view'], 'api_autocomplete')
+        self.assertGreaterEqual(profiles[0]['duration_ms'], 50)
+        stacks = read_stacks(profiles[0]['path'])
+        self.assertTrue(all(stack.startswith('django.') for stack in stacks)) # Frames of server and profiler itself are cut off
+        self.assertTrue(any('pogoyda_weather_app.views:api_autocomplete' in stack for stack in stacks))
+
+        output = StringIO()
+        call_command('profiles', '--view', 'api_autocomplete', '--top', '3', stdout=output)
+        self.assertIn('(2 profiles', output.getvalue())
+
+
+class TestStaticPipeline(TestCase):
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.static_root)
+
+    def test_minify_css_removes_comments_and_spaces_but_keeps_strings(self):
+        css = 'body {\n    color: #333; /* text */\n    font-family: \'Segoe UI\', sans-serif;\n}\n.a::after { content: "/* ok */"; }'
+        self.assertEqual(minify_css(css), 'body{color:#333;font-family:\'Segoe UI\',sans-serif}.a::after{content:"/* ok */"}')
+
+    def test_minify_js_removes_comments_and_indentation(self):
+        js = '// comment\nif (a) {\n    b(\'http://x\'); /* inline */\n}\n'
+        self.assertEqual(minify_js(js), "if (a) {\nb('http://x');\n}")
+
+    def test_collectstatic_writes_hashed_compressed_files_and_manifest(self):
+        storages = dict(settings.STORAGES, staticfiles={'BACKEND': 'pogoyda_weather_app.storage.MinifiedCompressedManifestStaticFilesStorage'})
+
+        with override_settings(STATIC_ROOT=self.static_root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+        manifest = (Path(self.static_root) / 'staticfiles.json').read_text()
+        hashed_css = re.search(r'css/styles\.[0-9a-f]{12}\.css', manifest).group(0)
+        self.assertTrue((Path(self.static_root) / f'{hashed_css}.gz').exists())
+        self.assertTrue((Path(self.static_root) / f'{hashed_css}.br').exists())
+        self.assertNotIn('/*', (Path(self.static_root) / hashed_css).read_text())
+
+    def test_service_worker_is_served_from_root_and_precaches_hashed_files(self):
+        storages = dict(settings.STORAGES, staticfiles={'BACKEND': 'pogoyda_weather_app.storage.MinifiedCompressedManifestStaticFilesStorage'})
+
+        with override_settings(STATIC_ROOT=self.static_root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            response = self.client.get('/sw.js')
+
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertRegex(response.content.decode(), r'"/static/css/styles\.[0-9a-f]{12}\.css"')
+
+    def run_service_worker(self, **scenario): # Navigation to scenario['url'] through the worker in node with fake caches and network
+        worker_path = Path(self.static_root) / 'sw.js'
+        worker_path.write_bytes(self.client.get('/sw.js').content)
+        result = subprocess.run(['node', '-e', SERVICE_WORKER_HARNESS, str(worker_path), json.dumps(scenario)],
+                                capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+    @skipUnless(shutil.which('node'), 'node is not installed')
+    def test_service_worker_shows_stored_page_at_once_and_updates_it_in_background(self):
+        server = {'status': 200, 'body': 'new page', 'headers': {'ETag': '"v2"'}}
+        stored_page = {'body': 'stored page', 'etag': '"v1"', 'age': 60}
+
+        fresh = self.run_service_worker(url='http://testserver/?city=Moscow', server=server, stored=stored_page)
+        stale = self.run_service_worker(url='http://testserver/?city=Moscow', server=server, stored=dict(stored_page, age=7200))
+        offline = self.run_service_worker(url='http://testserver/?city=Moscow', server=None, stored=dict(stored_page, age=7200))
+        private = self.run_service_worker(url='http://testserver/?city=Moscow', server=dict(server, headers={}), stored=stored_page)
+
+        self.assertEqual(fresh, {'body': 'stored page', 'fetches': [{'if-none-match': '"v1"'}], 'stored': 'new page'})
+        self.assertEqual(stale['body'], 'new page') # Its forecast days may be over
+        self.assertEqual(offline['body'], 'stored page')
+        self.assertIsNone(private['stored']) # User logged in, anonymous copy is dropped
+
+
+# Runs service worker script (argv[1]) for one navigation (argv[2]): fake Cache Storage with one stored page and fake network
+SERVICE_WORKER_HARNESS = '''
+const fs = require('fs'), vm = require('vm');
+const scenario = JSON.parse(process.argv[2]);
+const listeners = {}, stores = {}, fetches = [];
+global.self = {location: {origin: 'http://testserver'}, addEventListener: (type, listener) => { listeners[type] = listener; }};
+function open(name) {
+    const entries = stores[name] = stores[name] || new Map();
+    const key = request => typeof request === 'string' ? request : request.url;
+    return {match: async request => entries.has(key(request)) ? entries.get(key(request)).clone() : undefined,
+            put: async (request, response) => { entries.delete(key(request)); entries.set(key(request), response); },
+            delete: async request => entries.delete(key(request)),
+            keys: async () => [...entries.keys()].map(url => ({url}))};
+}
+global.caches = {open: async name => open(name), delete: async name => delete stores[name]};
+global.fetch = async (url, options) => {
+    fetches.push(Object.fromEntries(options.headers));
+    if (!scenario.server) throw new TypeError('Failed to fetch');
+    return new Response(scenario.server.body, {status: scenario.server.status, headers: scenario.server.headers});
+};
+vm.runInThisContext(fs.readFileSync(process.argv[1], 'utf8'));
+(async () => {
+    const stored = scenario.stored;
+    await open('pages').put(scenario.url, new Response(stored.body, {headers: {'ETag': stored.etag, 'X-Stored-At': String(Date.now() - stored.age * 1000)}}));
+    let response;
+    const pending = [];
+    listeners.fetch({request: {url: scenario.url, method: 'GET', mode: 'navigate'},
+                     respondWith: promise => { response = promise; }, waitUntil: promise => { pending.push(promise); }});
+    const body = await (await response).text();
+    await Promise.all(pending);
+    const copy = await open('pages').match(scenario.url);
+    console.log(JSON.stringify({body, fetches, stored: copy ? await copy.text() : null}));
+})();
+'''
+
+
+class TestBenchmarkHarness(TestCase):
+
+    def setUp(self):
+        self.stub = start_stub_server()
+        self.stub_url = f'http://127.0.0.1:{self.stub.server_address[1]}'
+
+    def tearDown(self):
+        self.stub.shutdown()
+        self.stub.server_close()
+
+    def test_stub_serves_forecast_and_counts_calls(self):
+        data = requests.get(f'{self.stub_url}/v1/forecast.json', params={'q': 'london', 'days': 3}).json()
+        error = requests.get(f'{self.stub_url}/v1/forecast.json', params={'q': 'NonExistCity123'}).json()
+        ipinfo = requests.get(f'{self.stub_url}/ipinfo/93.184.1.1/json').json()
+        stats = requests.get(f'{self.stub_url}/__stats').json()
+
+        self.assertEqual(data['location']['name'], 'London')
+        self.assertEqual(len(data['forecast']['forecastday']), 3)
+        self.assertEqual(error['error']['code'], 1006)
+        self.assertIn('city', ipinfo)
+        self.assertEqual(stats, {'forecast': 2, 'ipinfo': 1})
+
+    def test_index_works_against_stub(self):
+        with self.settings(WEATHERAPI_REQUESTS_LINK=f'{self.stub_url}/v1/forecast.json', IPINFO_REQUESTS_LINK=f'{self.stub_url}/ipinfo'):
+            cache.clear()
+            response = self.client.get('/', HTTP_X_FORWARDED_FOR='93.184.1.1')
+            cache.clear()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '°C')
+
+    def test_percentile_and_regression_check(self):
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        baseline = {'index': {'p95': 100.0, 'throughput': 50.0}}
+        self.assertEqual(compare_with_baseline({'index': {'p95': 110.0, 'throughput': 48.0}}, baseline, 15), [])
+        self.assertEqual(len(compare_with_baseline({'index': {'p95': 130.0, 'throughput': 30.0}}, baseline, 15)), 2)
+
+
+class TestGunicornConfig(TestCase):
+
+    def test_shipped_config_boots_on_fresh_host(self): # Metrics directory doesn't exist yet when preloaded app is imported
+        metrics_dir = Path(tempfile.mkdtemp()) / 'metrics'
+        with socket.socket() as free_socket:
+            free_socket.bind(('127.0.0.1', 0))
+            port = free_socket.getsockname()[1]
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(metrics_dir), GUNICORN_WORKERS='1', GUNICORN_BIND=f'127.0.0.1:{port}')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=settings.BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(f'http://127.0.0.1:{port}', server)
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(metrics_dir.parent)
+
+
+def make_token(**payload): # JWT the same way as views generate it
+    return jwt.encode(dict(payload, exp=datetime.utcnow() + timedelta(hours=1)), settings.SECRET_KEY, algorithm='HS256')
+
+
+# Performance contract of every view: url name -> (method, path, logged in, budget).
+# Requests run on cold cache against local upstream stub, so budgets include upstream calls of first visit.
+VIEW_BUDGETS = {
+    'index_url': ('get', '/', False, {'queries': 4, 'cache_ops': 5, 'http_calls': 2}),
+    'custom_register': ('get', '/register/', False, {'queries': 0, 'cache_ops': 2, 'http_calls': 0}),
+    'email_notify': ('get', '/email_notify/', False, {'queries': 0, 'cache_ops': 0, 'http_calls': 0}),
+    'custom_login': ('get', '/login/', True, {'queries': 3, 'cache_ops': 2, 'http_calls': 0}),
+    'custom_logout': ('get', '/logout/', True, {'queries': 4, 'cache_ops': 2, 'http_calls': 0}),
+    'password_reset': ('get', '/password_reset/', True, {'queries': 3, 'cache_ops': 0, 'http_calls': 0}),
+    'custom_recovery_account': ('get', f'/recovery_account/{make_token(email="budget@test.com", username="budgetuser")}/', True,
+                                {'queries': 3, 'cache_ops': 2, 'http_calls': 0}),
+    'create_favorites': ('get', '/create_fav/', True, {'queries': 6, 'cache_ops': 2, 'http_calls': 0}),
+    'toggle_forecast_digest': ('get', '/forecast_digest/', True, {'queries': 3, 'cache_ops': 2, 'http_calls': 0}),
+    'create_alert': ('get', '/favorites/1/alerts/', True, {'queries': 4, 'cache_ops': 2, 'http_calls': 0}),
+    'delete_alert': ('get', '/alerts/1/delete/', True, {'queries': 3, 'cache_ops': 2, 'http_calls': 0}),
+    'show_favorites': ('get', '/show_favorites/?city=London', True, {'queries': 4, 'cache_ops': 2, 'http_calls': 0}),
+    'custom_confirm': ('get', f'/confirm/{make_token(email="new@test.com", username="newuser", password="newpass123")}/', False,
+                       {'queries': 9, 'cache_ops': 0, 'http_calls': 0}),
+    'incorrect_city': ('get', '/incorrect_city/NonExistCity123', True, {'queries': 3, 'cache_ops': 0, 'http_calls': 0}),
+    'redirect_to_api_error': ('get', '/API_error/', True, {'queries': 3, 'cache_ops': 0, 'http_calls': 0}),
+    'api_forecast': ('get', '/api/forecast/London/', False, {'queries': 0, 'cache_ops': 4, 'http_calls': 1}),
+    'api_autocomplete': ('get', '/api/autocomplete/?q=mos', False, {'queries': 0, 'cache_ops': 1, 'http_calls': 0}),
+    'api_history': ('get', '/api/history/London/', False, {'queries': 1, 'cache_ops': 2, 'http_calls': 0}),
+    'forecast_day': ('get', f'/forecast/London/{datetime.utcnow():%Y-%m-%d}/', False, {'queries': 0, 'cache_ops': 3, 'http_calls': 0}),
+    'live_weather': ('get', '/live/London/', False, {'queries': 0, 'cache_ops': 0, 'http_calls': 0}),
+    'service_worker': ('get', '/sw.js', False, {'queries': 0, 'cache_ops': 0, 'http_calls': 0}),
+    'metrics': ('get', '/metrics', False, {'queries': 0, 'cache_ops': 0, 'http_calls': 0}),
+}
+
+
+class TestViewPerformanceBudgets(PerformanceBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='budgetuser', email='budget@test.com', password='testpass123')
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.last_sync = time.monotonic() # Sync of city index with cache happens once a minute, keep it out of budgets
+        self.stub = start_stub_server()
+        stub_url = f'http://127.0.0.1:{self.stub.server_address[1]}'
+        self.upstream_settings = self.settings(WEATHERAPI_REQUESTS_LINK=f'{stub_url}/v1/forecast.json',
+                                               IPINFO_REQUESTS_LINK=f'{stub_url}/ipinfo')
+        self.upstream_settings.enable()
+
+    def tearDown(self):
+        self.upstream_settings.disable()
+        self.stub.shutdown()
+        self.stub.server_close()
+        cache.clear()
+
+    def test_every_view_has_budget(self):
+        url_names = {pattern.name for pattern in get_resolver('pogoyda_weather_app.urls').url_patterns}
+        self.assertEqual(url_names - set(VIEW_BUDGETS), set())
+
+    def test_views_stay_within_budget(self):
+        for url_name, (method, path, logged_in, budget) in VIEW_BUDGETS.items():
+            with self.subTest(url_name):
+                cache.clear()
+                self.client.logout()
+                if logged_in:
+                    self.client.force_login(self.user)
+                    session = self.client.session
+                    session.update({'city': 'London', 'country': 'United Kingdom'})
+                    session.save()
+
+                with self.assertBudget(**budget):
+                    getattr(self.client, method)(path, HTTP_X_FORWARDED_FOR='93.184.1.1')
+
+    def test_warm_index_reads_redis_in_two_round_trips(self):
+        self.client.get('/', HTTP_X_FORWARDED_FOR='93.184.1.1') # Caches forecast and saves city to session
+
+        with self.assertBudget(cache_ops=2, http_calls=0) as recorder: # Ratelimit counter with forecast, then template fragment
+            self.client.get('/', HTTP_X_FORWARDED_FOR='93.184.1.1')
+
+        self.assertIn('MGET', recorder.cache_ops[0])
+
+    def test_batch_writes_are_sent_with_response(self):
+        batch = RedisBatch()
+        batch.set('batched', {'city': 'Moscow'}, 60)
+
+        self.assertEqual(batch.get('batched'), {'city': 'Moscow'})
+        self.assertIsNone(cache.get('batched'))
+        batch.flush()
+        self.assertEqual(cache.get('batched'), {'city': 'Moscow'})
+        self.assertEqual(RedisBatch().fetch(['batched', 'missing'], counter=('counter', 60)), 1)
+
+    def test_batch_writes_with_zero_timeout_delete_and_none_never_expires(self):
+        cache.set('expired', 'old', 60)
+        batch = RedisBatch()
+        batch.set('expired', 'new', 0)
+        batch.set('forever', 'value', None)
+
+        batch.flush()
+
+        self.assertIsNone(cache.get('expired'))
+        self.assertEqual(cache.get('forever'), 'value')
+        self.assertEqual(get_redis().ttl(cache.make_and_validate_key('forever')), -1)
+
+    @patch('pogoyda_weather_app.weather_cache.get_weather_data', return_value=make_weather_data())
+    def test_fetched_weather_is_written_before_response(self, mock_weather):
+        get_weather_from_cache('Moscow', RedisBatch())
+
+        self.assertEqual(cache.get('Moscow')['location']['name'], 'Moscow') # Concurrent misses of the city find it at once
+
+    def test_budget_failure_lists_operations(self):
+        with self.assertRaises(AssertionError) as error:
+            with self.assertBudget(queries=0):
+                CustomUser.objects.count()
+
+        self.assertIn('ORM queries: 1 > budget 0', str(error.exception))
+        self.assertIn('SELECT COUNT', str(error.exception))
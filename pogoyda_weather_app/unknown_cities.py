@@ -0,0 +1,70 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .autocomplete import normalize_city
+from .cache_backend import REDIS_ERRORS, get_redis
+
+
+class BloomFilter: # Fixed-size bit array in Redis: memory doesn't grow with added items, false positive rate does
+    def __init__(self, key, capacity, error_rate):
+        self.key = key
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2) # Optimal number of bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2))) # Optimal number of hash functions
+
+    def positions(self, item): # Double hashing: k positions from two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item, pipeline, ttl):
+        for position in self.positions(item):
+            pipeline.setbit(self.key, position, 1)
+        pipeline.expire(self.key, ttl)
+
+    def check(self, item, pipeline): # Queue GETBIT commands, all returned bits must be 1
+        for position in self.positions(item):
+            pipeline.getbit(self.key, position)
+
+
+class UnknownCities: # Queries weather API didn't find. Filter is replaced every `period` seconds, so query stays blocked for 1-2 periods
+    def __init__(self, period, capacity, error_rate):
+        self.period = period
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+    def get_filters(self): # Current and previous generation
+        generation = int(time.time()) // self.period
+        return [BloomFilter(f'unknown_cities:{generation - age}', self.capacity, self.error_rate) for age in (0, 1)]
+
+    def execute(self, pipeline): # None when Redis is unreachable: filter is only an optimization, so it's skipped
+        if not cache.redis_available():
+            return None
+        try:
+            return pipeline.execute()
+        except REDIS_ERRORS as error:
+            cache.report_failure(error)
+            return None
+
+    def add(self, city):
+        pipeline = get_redis().pipeline(transaction=False)
+        self.get_filters()[0].add(normalize_city(city), pipeline, ttl=2 * self.period)
+        self.execute(pipeline)
+
+    def __contains__(self, city): # One round trip for both generations
+        pipeline = get_redis().pipeline(transaction=False)
+        filters = self.get_filters()
+        for bloom_filter in filters:
+            bloom_filter.check(normalize_city(city), pipeline)
+
+        bits = self.execute(pipeline)
+        if bits is None:
+            return False
+        hashes = filters[0].hashes
+        return any(all(bits[index:index + hashes]) for index in range(0, len(bits), hashes))
+
+
+unknown_cities = UnknownCities(settings.UNKNOWN_CITIES_PERIOD, settings.UNKNOWN_CITIES_CAPACITY, settings.UNKNOWN_CITIES_ERROR_RATE)
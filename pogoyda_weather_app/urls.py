@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import metrics, views
 
 
 urlpatterns = [
@@ -11,8 +11,18 @@ urlpatterns = [
     path('password_reset/', views.custom_password_reset, name='password_reset'),
     path('recovery_account/<token>/', views.custom_recovery_account, name='custom_recovery_account'),
     path('create_fav/', views.create_favorites, name='create_favorites'),
+    path('forecast_digest/', views.toggle_forecast_digest, name='toggle_forecast_digest'),
+    path('favorites/<int:favorite_id>/alerts/', views.create_alert, name='create_alert'),
+    path('alerts/<int:alert_id>/delete/', views.delete_alert, name='delete_alert'),
     path('show_favorites/', views.show_favorites, name='show_favorites'),
     path('confirm/<token>/', views.custom_confirm, name='custom_confirm'),
     path('incorrect_city/<city>', views.incorrect_city, name='incorrect_city'),
     path('API_error/', views.redirect_to_api_error, name='redirect_to_api_error'),
+    path('api/forecast/<city>/', views.api_forecast, name='api_forecast'),
+    path('api/autocomplete/', views.api_autocomplete, name='api_autocomplete'),
+    path('api/history/<city>/', views.api_history, name='api_history'),
+    path('forecast/<city>/<date>/', views.forecast_day, name='forecast_day'),
+    path('live/<city>/', views.live_weather, name='live_weather'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('metrics', metrics.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,6 +1,17 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotFound, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language, get_language_from_request
+import asyncio
+import hashlib
+import json
+import logging
 import requests
 import pymorphy3
 from datetime import datetime
@@ -12,17 +23,39 @@ from .forms import *
 from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.core.mail import send_mail
-from .models import FavoriteLocation
+from .autocomplete import get_city_index
+from .cache_backend import REDIS_ERRORS
+from .history import get_history
+from .icons import get_local_icon_url
+from .live import live_updates
+from .metrics import RATELIMIT_REJECTIONS, UPSTREAM_RESPONSES, span
+from .models import FavoriteLocation, ForecastObservation, WeatherAlert
+from .weather_cache import WEATHER_CACHE_TIMEOUT, get_cached_weather, get_weather_cache_keys, get_weather_from_cache
 from django.core.cache import cache
+from django_ratelimit.core import is_ratelimited
 from django_ratelimit.decorators import ratelimit
+from django_ratelimit.exceptions import Ratelimited
+from asgiref.sync import sync_to_async
 import jwt
 
 morph = pymorphy3.MorphAnalyzer()
+logger = logging.getLogger(__name__)
+
+SUPPORTED_LANGS = ['en', 'ru']
+FORECAST_STEPS = [1, 3] # Allowed forecast resolution, hours between forecast entries
+DEFAULT_FORECAST_STEP = 3
+INDEX_RATE = '30/m' # Index counts requests itself, see RedisBatch.check_ratelimit()
+SERVICE_WORKER_PRECACHE = ['css/styles.css', 'js/dark_theme.js', 'js/service_worker.js', 'js/forecast.js', 'js/autocomplete.js', 'js/live.js',
+                           'favicon.ico', 'images/Temperature_pic.png', 'images/Wind_speed_pic.png', 'images/Humidity_pic.png'] # App shell
+STREAM_MARKER = '<!-- forecast -->' # Place of forecast section in page shell rendered with streaming=True, see index.html
+ALERT_MESSAGE_TAG = 'weather-alert' # extra_tags of alert form errors, forecast section shows only these messages
+HISTORY_KINDS = {ForecastObservation.CURRENT: 'current', ForecastObservation.HOURLY: 'hourly', ForecastObservation.DAILY: 'daily'}
 
 def is_russian(text): # Check if text contains only Russian letters, hyphens and spaces
     return bool(re.match(r'^[а-яА-ЯёЁ\s-]+$', text))
 
 
+@span('pymorphy')
 def get_city_in_locative(city_name): # Convert city name to locative case, e.g. Moscow --> in Moscow
     parsed_word = morph.parse(city_name)[0]
     city_in_prepositional = parsed_word.inflect({'loct'}).word
@@ -53,30 +86,46 @@ def generate_account_recovery_token(email, username): # Generate token for passw
 
 
 
-def extract_forecast_data(data, lang):
+def extract_hours(day_data, lang, step=DEFAULT_FORECAST_STEP): # Hourly forecast of one day with given resolution
+    hours = []
+
+    for hour_data in day_data['hour']: # Process each hour's forecast
+        hour = int(hour_data['time'][11:13]) # Extract hour from time string
+        if hour % step == 1 % step:  # Get data every `step` hours, 3-hour steps start from 01:00
+            hours.append({ # Add data to hourly forecast
+                'time': hour_data['time'][11:16], # Keep only hours and minutes
+                'temp_c': hour_data['temp_c'], # Temperature in Celsius
+                'wind': hour_data['wind_kph'] if lang == 'ru' else hour_data['wind_mph'], # Wind speed in km/h
+                'wind_unit': 'км/ч' if lang == 'ru' else 'mph',
+                'humidity': hour_data['humidity'], # Humidity
+                'condition_icon': get_local_icon_url(hour_data['condition']['icon']), # Weather icon, mirrored copy when there is one
+                'condition_text': hour_data['condition']['text'] # Weather condition
+            })
+
+    return hours
+
+
+def extract_current(current, lang): # Current weather as page shows it, also used for live updates
+    return {
+        'temp_c': current['temp_c'],
+        'wind': current['wind_kph'] if lang == 'ru' else current['wind_mph'],
+        'wind_unit': 'км/ч' if lang == 'ru' else 'mph',
+        'humidity': current['humidity'],
+        'condition_icon': get_local_icon_url(current['condition']['icon']),
+        'condition_text': current['condition']['text'],
+    }
+
+
+def extract_forecast_data(data, lang, days=None, step=DEFAULT_FORECAST_STEP, expanded_days=None):
+    # days limits forecast horizon, hours are extracted only for first expanded_days days, others are loaded lazily
     forecast_by_days = [] # Create list for forecast data to use later
 
-    for day_data in data['forecast']['forecastday']: # Process each day's general information
-        day_entry = { # Store day data
+    for index, day_data in enumerate(data['forecast']['forecastday'][:days]): # Process each day's general information
+        forecast_by_days.append({ # Store day data
             'date': day_data['date'], # Date in API format
             'date_formatted': datetime.strptime(day_data['date'], '%Y-%m-%d').strftime('%d.%m.%Y'), # Date in website format
-            'hours': [] # Store weather information for each hour
-        }
-
-        for hour_data in day_data['hour']: # Process each hour's forecast
-            hour = int(hour_data['time'][11:13]) # Extract hour from time string
-            if hour % 3 == 1:  # Get data every 3 hours starting from 01:00
-                day_entry['hours'].append({ # Add data to hourly forecast
-                    'time': hour_data['time'][11:16], # Keep only hours and minutes
-                    'temp_c': hour_data['temp_c'], # Temperature in Celsius
-                    'wind': hour_data['wind_kph'] if lang == 'ru' else hour_data['wind_mph'], # Wind speed in km/h
-                    'wind_unit': 'км/ч' if lang == 'ru' else 'mph',
-                    'humidity': hour_data['humidity'], # Humidity
-                    'condition_icon': hour_data['condition']['icon'], # Weather icon
-                    'condition_text': hour_data['condition']['text'] # Weather condition
-                })
-
-        forecast_by_days.append(day_entry) # Update forecast data list
+            'hours': extract_hours(day_data, lang, step) if expanded_days is None or index < expanded_days else [], # Weather for each hour
+        })
 
     location = { # Location data
         'city': data['location']['name'],
@@ -84,15 +133,7 @@ def extract_forecast_data(data, lang):
         'country': data['location']['country'],
     }
 
-    current = { # Current weather data, separated from forecast to avoid confusion
-        'localtime': data['location']['localtime'],
-        'temp_c': data['current']['temp_c'],
-        'wind': data['current']['wind_kph'] if lang == 'ru' else data['current']['wind_mph'],
-        'wind_unit': 'км/ч' if lang == 'ru' else 'mph',
-        'humidity': data['current']['humidity'],
-        'condition_icon': data['current']['condition']['icon'],
-        'condition_text': data['current']['condition']['text'],
-    }
+    current = dict(extract_current(data['current'], lang), localtime=data['location']['localtime']) # Separated from forecast to avoid confusion
 
     return {
         'forecast_by_days': forecast_by_days,
@@ -101,92 +142,95 @@ def extract_forecast_data(data, lang):
     }
 
 
-def get_user_ip(request): # Get user's IP address
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        return x_forwarded_for.split(',')[0]
-    return request.META.get('REMOTE_ADDR')
-
+def get_forecast_params(request): # Forecast horizon in days and resolution in hours from query string
+    try:
+        days = min(max(int(request.GET.get('days', settings.FORECAST_MAX_DAYS)), 1), settings.FORECAST_MAX_DAYS)
+    except ValueError:
+        days = settings.FORECAST_MAX_DAYS
 
-def get_user_city(request): # Get user's city using IP via external API
-    ip = get_user_ip(request)
-    if not ip or ip in ['127.0.0.1', 'localhost']:
-        ip = '8.8.8.8'
+    try:
+        step = int(request.GET.get('step', DEFAULT_FORECAST_STEP))
+    except ValueError:
+        step = DEFAULT_FORECAST_STEP
 
+    return days, step if step in FORECAST_STEPS else DEFAULT_FORECAST_STEP
 
-    response = requests.get(f'https://ipinfo.io/{ip}/json').json()
-    if 'bogon' in response: # If a non-routable IP is used, then send a repeat request
-        response = requests.get(f'https://ipinfo.io/8.8.8.8/json').json()
 
+def get_request_lang(request): # Language cookie or the best of Accept-Language by q-values, the same as LocaleMiddleware activates
+    lang = get_language_from_request(request)
+    return lang if lang in SUPPORTED_LANGS else 'en' # If browser language is supported, use it, otherwise default to English
 
-    city = response['city']
 
-    return city
+def get_forecast_version(weather_data): # Forecast version changes only when weather API updates data for the location
+    current = weather_data['current']
+    return str(current.get('last_updated_epoch') or weather_data['location'].get('localtime_epoch', ''))
 
 
-def get_weather_data(city): # Get weather data
-    try:
-        key = settings.WEATHERAPI_KEY
-        url_forecast = settings.WEATHERAPI_REQUESTS_LINK
-        params = {'key': key, 'q': city, 'days': 3}  # Parameters for weather API request
+def get_forecast_etag(*parts): # Strong ETag for response that depends only on city, language and forecast version. City is name and country:
+    # version is last update time of weather station, and same-named cities (Paris FR / Paris US) may share it
+    raw_etag = ':'.join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(raw_etag.encode()).hexdigest())
 
-        response = requests.get(url_forecast, params=params, timeout=10) # Send request to get weather data
-        data = response.json()
 
-        if 'error' in data and data['error']['code'] == 1006: # User entered invalid city
-            return {'error_type': 'City_not_found', 'city': city}
+def get_cache_time_left(weather_data): # Seconds until cached weather data expires
+    cached_at = weather_data.get('cached_at', int(time.time()))
+    return max(0, WEATHER_CACHE_TIMEOUT - (int(time.time()) - cached_at))
 
-        if 'error' in data: # Any other error is considered API error
-            return {'error_type': 'API_error'}
 
-    except requests.exceptions.Timeout:
-        return {'error_type': 'API_timeout'}
-    except Exception as e: # Catch all other exceptions as API errors
-        return {'error_type': 'API_error', 'message': str(e)}
+def get_user_ip(request): # Get user's IP address
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
 
-    return data
 
+def get_ipinfo(ip): # Request geolocation data for IP
+    response = requests.get(f'{settings.IPINFO_REQUESTS_LINK}/{ip}/json')
+    UPSTREAM_RESPONSES.labels('ipinfo', response.status_code).inc()
+    return response.json()
 
-def create_and_get_weather_from_cache(city): # Get weather data, create cache, return weather data
-    weather_data = get_weather_data(city)
 
-    if 'error_type' in weather_data: # If response contains error
-        error_type = weather_data['error_type'] # Store error type
+@span('get_user_city')
+def get_user_city(request): # Get user's city using IP via external API
+    ip = get_user_ip(request)
+    if not ip or ip in ['127.0.0.1', 'localhost']:
+        ip = '8.8.8.8'
 
-        if error_type == 'City_not_found':
-            cache.set(city, 'City_not_found', 3600)
 
-        elif error_type in ['API_timeout', 'API_error']:
-            cache.set(city, error_type, 300)
+    response = get_ipinfo(ip)
+    if 'bogon' in response: # If a non-routable IP is used, then send a repeat request
+        response = get_ipinfo('8.8.8.8')
 
-        return cache.get(city)
 
-    cache.set(city, weather_data, 60) # Store cache for 60 seconds because data updates every minute
-    return weather_data
+    city = response['city']
 
+    return city
 
-def get_weather_from_cache(city): # Get weather data from cache
 
-    weather_data = cache.get(city)
+def get_requested_city(request): # City entered by user or searched last time, None if it has to be detected by IP
 
-    if weather_data:
-        return weather_data
+    for data in (request.POST, request.GET): # If user manually entered city for search, use this value. Search form sends GET
+        if 'city' in data:
+            form = SearchForm(data)
+            if form.is_valid():
+                return form.cleaned_data['city']
 
-    if weather_data is None: # if no data, use another function
-        return create_and_get_weather_from_cache(city)
+    if request.session.get('city'): # If user didn't enter, get from session last searched city
+        return request.session.get('city')
 
+    return None
 
-def get_search_city(request): # Get city for weather search
+def is_public_request(request): # Anonymous GET with explicit city: page depends only on URL and language, shared caches may keep it
+    return request.method == 'GET' and 'city' in request.GET and not request.user.is_authenticated
 
-    if 'city' in request.POST: # If user manually entered city for search, use this value
-        form = SearchForm(request.POST)
-        if form.is_valid():
-            return form.cleaned_data['city']
 
-    if request.session.get('city'): # If user didn't enter, get from session last searched city
-        return request.session.get('city')
+def patch_page_caching(response, public, weather_data):
+    if public: # Reverse proxy serves it to other anonymous visitors until forecast expires. Vary: Accept-Language, Cookie is set by middlewares
+        patch_cache_control(response, public=True, max_age=get_cache_time_left(weather_data))
+    else: # Depends on session or IP
+        patch_cache_control(response, private=True)
+    return response
 
-    return get_user_city(request)
 
 @login_required(login_url='/', redirect_field_name=None)
 def add_to_history(request, location): # Add to search history
@@ -201,27 +245,29 @@ def add_to_history(request, location): # Add to search history
         request.session['search_history'] = request.session['search_history'][:10]  # Limit list size to 10 elements
 
 
-@ratelimit(key='ip', rate='30/m')
-def index(request): # Main function
-    city = get_search_city(request)
+def remember_search(request, location):
+    request.session['country'] = location['country'] # Add to session so after page reload user sees the city they entered
+    request.session['city'] = location['city']
+    add_to_history(request, location) # Add to user's search history
 
-    browser_lang = request.META.get('HTTP_ACCEPT_LANGUAGE', 'en')[:2] # Detect language from browser settings
-    supported_langs = ['en', 'ru'] # Supported languages
-    lang = browser_lang if browser_lang in supported_langs else 'en' # If browser language is supported, use it, otherwise default to English
 
-    weather_data = get_weather_from_cache(city)
+def get_favorites(request):
+    return FavoriteLocation.objects.filter(user=request.user).prefetch_related('alerts')
 
-    if weather_data == 'City_not_found': # If city not found, notify user
-        return redirect('incorrect_city', city)
-    elif weather_data in ['API_timeout', 'API_error']: # Other errors are considered API errors, notify user
-        return redirect('redirect_to_api_error')
 
-    forecast = extract_forecast_data(weather_data, lang) # Extract weather forecast from weather data
-    location = forecast['location'] # Location data (city, region, country)
-    request.session['country'] = location['country'] # Add to session so after page reload user sees the city they entered
-    request.session['city'] = location['city']
+def pop_alert_errors(request): # Reading messages marks all of them as shown, so messages of other pages are queued again
+    alert_errors = []
+    for message in messages.get_messages(request):
+        if ALERT_MESSAGE_TAG in message.extra_tags.split():
+            alert_errors.append(message)
+        else:
+            messages.add_message(request, message.level, message.message, extra_tags=message.extra_tags)
+    return alert_errors
 
-    add_to_history(request, location) # Add to user's search history
+
+def get_forecast_context(request, city, forecast, weather_data, lang, days, step, favorites=None, alert_errors=None): # Context of forecast section, also streamed alone
+    location = forecast['location']
+    canonical_city = location['city']
 
     if lang == 'ru' and is_russian(location['city']): # If language is Russian and search was in Russian, show city in Russian locative case
         location['city'] = get_city_in_locative(location['city'])
@@ -232,13 +278,271 @@ def index(request): # Main function
     time_list = (day, month_en, time)
 
     context = {'current_weather': current_weather, 'location': location, 'localtime': localtime, 'time_list': time_list,
-               'forecast': forecast['forecast_by_days'], 'incorrect_city': incorrect_city}
+               'forecast': forecast['forecast_by_days'], 'incorrect_city': incorrect_city,
+               'canonical_city': canonical_city, 'cache_city': city, 'lang': lang, 'forecast_version': get_forecast_version(weather_data),
+               'forecast_days': days, 'forecast_step': step, 'full_step': FORECAST_STEPS[0]}
 
     if request.user.is_authenticated:
-        favorites = FavoriteLocation.objects.filter(user=request.user)
+        favorites = get_favorites(request) if favorites is None else favorites
         context['favorites'] = favorites
+        context['current_favorite'] = next((favorite for favorite in favorites # Alerts can be set only on favorite cities
+                                            if favorite.city == canonical_city and favorite.country == location['country']), None)
+        context['alert_form'] = WeatherAlertForm()
+        if alert_errors is None and context['current_favorite']:
+            alert_errors = pop_alert_errors(request)
+        context['alert_errors'] = alert_errors if context['current_favorite'] else []
 
-    return render(request, 'index.html', context=context)
+    return context
+
+
+def index(request): # Main function
+    batch = request.redis_batch # Ratelimit counter and cached forecast are read in one round trip, writes are sent with response
+    city = get_requested_city(request)
+    batch.check_ratelimit(request, 'index', INDEX_RATE, get_weather_cache_keys(city) if city else [])
+    lang = get_request_lang(request)
+    days, step = get_forecast_params(request)
+
+    if settings.INDEX_STREAMING and (city is None or get_cached_weather(city, batch) is None): # Slow upstream calls are ahead
+        return stream_index(request, city, lang, days, step)
+
+    city = city or get_user_city(request) # Checked after ratelimit, so rejected requests don't call ipinfo
+    weather_data = get_weather_from_cache(city, batch)
+
+    if weather_data == 'City_not_found': # If city not found, notify user
+        return redirect('incorrect_city', city)
+    elif weather_data in ['API_timeout', 'API_error']: # Other errors are considered API errors, notify user
+        return redirect('redirect_to_api_error')
+
+    forecast = extract_forecast_data(weather_data, lang, days, step, expanded_days=1) # Only first day is rendered inline, others are loaded on demand
+    location = forecast['location'] # Location data (city, region, country)
+    public = is_public_request(request)
+
+    if not public: # Public request leaves no trace, so its response sets no cookie and can be shared
+        remember_search(request, location)
+
+    canonical_city = location['city'] # City name from API, used as key for cached forecast section
+    forecast_version = get_forecast_version(weather_data)
+    etag = None
+
+    if request.method == 'GET' and not request.user.is_authenticated: # Anonymous page depends only on city, language and forecast, so browser can revalidate it
+        etag = get_forecast_etag(city, canonical_city, location['country'], lang, get_language(), forecast_version, days, step) # Page links use cache key of the query
+        last_modified = weather_data['current'].get('last_updated_epoch')
+        not_modified_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified_response is not None: # Browser already has this page, answer with 304 without rendering
+            return patch_page_caching(not_modified_response, public, weather_data)
+
+    context = get_forecast_context(request, city, forecast, weather_data, lang, days, step)
+
+    with span('template_render'):
+        response = render(request, 'index.html', context=context)
+
+    if etag: # Add validators so browser can send conditional request next time
+        response.headers['ETag'] = etag
+        if weather_data['current'].get('last_updated_epoch'):
+            response.headers['Last-Modified'] = http_date(weather_data['current']['last_updated_epoch'])
+
+    return patch_page_caching(response, public, weather_data)
+
+
+def stream_index(request, city, lang, days, step): # Page shell goes out before upstream calls, so browser loads static files meanwhile
+    public = is_public_request(request)
+    favorites = list(get_favorites(request)) if request.user.is_authenticated else None
+    # Messages are read before MessageMiddleware stores what is left with response headers, the forecast is rendered after that
+    alert_errors = pop_alert_errors(request) if request.user.is_authenticated else None
+    if not public and not request.session.session_key: # Session cookie is sent with headers, before city is known
+        request.session.create()
+
+    with span('template_render'):
+        head, tail = render_to_string('index.html', {'streaming': True, 'favorites': favorites}, request).split(STREAM_MARKER)
+
+    def content():
+        yield head
+        yield render_streamed_forecast(request, city, lang, days, step, public, favorites, alert_errors)
+        yield tail
+
+    response = StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
+    patch_cache_control(response, private=True) # Status is sent before forecast, so even error page is 200 and mustn't be shared
+    return response
+
+
+def render_streamed_forecast(request, city, lang, days, step, public, favorites, alert_errors): # Forecast section, or error message in its place
+    try:
+        city = city or get_user_city(request)
+        weather_data = get_weather_from_cache(city) # Straight to cache, request's RedisBatch was flushed when response started
+        if not isinstance(weather_data, dict): # Too late to redirect to error page, its message is shown in the page instead
+            return render_to_string('index_stream_error.html', {
+                'not_found': weather_data == 'City_not_found',
+                'suggestions': get_city_index().similar(city) if weather_data == 'City_not_found' else [],
+            }, request)
+
+        forecast = extract_forecast_data(weather_data, lang, days, step, expanded_days=1)
+        if not public:
+            remember_search(request, forecast['location'])
+            request.session.save() # SessionMiddleware has already saved session with response headers
+        context = get_forecast_context(request, city, forecast, weather_data, lang, days, step, favorites, alert_errors)
+        with span('template_render'):
+            return render_to_string('index_forecast.html', context, request)
+    except Exception: # Headers are sent, so error can't become 500 page
+        logger.exception('Streamed forecast of %s failed', city)
+        return render_to_string('index_stream_error.html', {'not_found': False}, request)
+
+
+@ratelimit(key='ip', rate='60/m')
+def api_forecast(request, city): # Read-only JSON forecast, doesn't touch session or search history
+    lang = request.GET.get('lang', 'en')
+    if lang not in SUPPORTED_LANGS:
+        lang = 'en'
+    days, step = get_forecast_params(request)
+
+    weather_data = get_weather_from_cache(city)
+
+    if weather_data == 'City_not_found':
+        return JsonResponse({'error': 'city_not_found', 'city': city}, status=404)
+    elif weather_data in ['API_timeout', 'API_error']: # Errors are cached for 5 minutes, so clients shouldn't retry earlier
+        response = JsonResponse({'error': 'weather_api_unavailable'}, status=503)
+        response.headers['Retry-After'] = 300
+        return response
+
+    forecast_version = get_forecast_version(weather_data)
+    etag = get_forecast_etag(weather_data['location']['name'], weather_data['location']['country'], lang, forecast_version, days, step)
+    max_age = get_cache_time_left(weather_data) # Clients and proxies keep response exactly as long as our cache does
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        forecast = extract_forecast_data(weather_data, lang, days, step)
+        current = forecast['current']
+        response = JsonResponse({
+            'version': forecast_version,
+            'location': forecast['location'],
+            'current': {
+                'localtime': current['localtime'],
+                'temp_c': current['temp_c'],
+                'wind': current['wind'],
+                'wind_unit': current['wind_unit'],
+                'humidity': current['humidity'],
+                'condition_icon': current['condition_icon'],
+                'condition_text': current['condition_text'],
+            },
+            'forecast': [{'date': day['date'], 'hours': day['hours']} for day in forecast['forecast_by_days']],
+        }, json_dumps_params={'ensure_ascii': False})
+
+    response.headers['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def api_autocomplete(request): # City suggestions from in-memory index, called on every keystroke, so no rate limit, database or weather API
+    query = request.GET.get('q', '')[:100]
+    suggestions = get_city_index().suggest(query) if len(query.strip()) >= 2 else []
+
+    response = JsonResponse({'query': query, 'suggestions': suggestions}, json_dumps_params={'ensure_ascii': False})
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+@ratelimit(key='ip', rate='60/m')
+def api_history(request, city): # Stored weather of the last days, answered from database without weather API calls
+    try:
+        days = min(max(int(request.GET.get('days', 7)), 1), settings.FORECAST_HISTORY_RETENTION_DAYS)
+    except ValueError:
+        days = 7
+
+    observations = [{
+        'kind': HISTORY_KINDS[row['kind']],
+        'time': row['observed_at'].isoformat(),
+        'temp_c': row['temp_c'],
+        'wind_kph': row['wind_kph'],
+        'humidity': row['humidity'],
+        'condition_code': row['condition_code'],
+    } for row in get_history(city, days)]
+
+    response = JsonResponse({'city': city, 'days': days, 'observations': observations})
+    patch_cache_control(response, public=True, max_age=WEATHER_CACHE_TIMEOUT) # New data is recorded at most once a minute
+    return response
+
+
+def service_worker(request): # Served from site root: worker script under /static/ could control only /static/ URLs
+    precache_urls = [static(path) for path in SERVICE_WORKER_PRECACHE]
+    response = render(request, 'sw.js', context={
+        'version': hashlib.md5(''.join(precache_urls).encode()).hexdigest()[:12], # Hashed names change, so does the worker
+        'static_prefix': json.dumps(settings.STATIC_URL),
+        'precache_urls': json.dumps(precache_urls),
+    }, content_type='application/javascript')
+    patch_cache_control(response, no_cache=True) # Browser checks for new worker, and with it for new static files, on every visit
+    return response
+
+
+@ratelimit(key='ip', rate='60/m')
+def forecast_day(request, city, date): # HTML fragment with hourly forecast of one day, page loads it when user expands the day
+    lang = get_request_lang(request)
+    days, step = get_forecast_params(request)
+
+    weather_data = get_cached_weather(city) # Page links to the cache entry it was rendered from, fragments never call weather API
+
+    if weather_data is None: # Expired or never fetched, page reload fetches it again
+        return HttpResponseNotFound()
+    elif weather_data in ['API_timeout', 'API_error']:
+        response = HttpResponse(status=503)
+        response.headers['Retry-After'] = 300
+        return response
+
+    day_data = next((day for day in weather_data['forecast']['forecastday'] if day['date'] == date), None)
+    if day_data is None:
+        return HttpResponseNotFound()
+
+    etag = get_forecast_etag(weather_data['location']['name'], weather_data['location']['country'], lang, get_language(),
+                             get_forecast_version(weather_data), date, step)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(request, 'forecast_hours.html', context={'hours': extract_hours(day_data, lang, step)})
+
+    response.headers['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=get_cache_time_left(weather_data))
+    return response
+
+
+async def live_weather(request, city): # Server-Sent Events: current weather whenever cache entry of `city` (page's cache key) is refreshed
+    if not isinstance(request, ASGIRequest): # Every open page would hold a WSGI thread, EventSource stops reconnecting on 204
+        return HttpResponse(status=204)
+    if await sync_to_async(is_ratelimited)(request, group='live_weather', key='ip', rate='30/m', increment=True):
+        raise Ratelimited()
+
+    cached = await sync_to_async(get_cached_weather)(city)
+    if not isinstance(cached, dict): # Only cities somebody has just looked at, so streams can't be used to query weather API
+        return HttpResponseNotFound()
+
+    lang = get_request_lang(request)
+    if not cache.redis_available(): # Updates go through Redis pub/sub
+        return HttpResponse(status=204)
+    try:
+        queue = await live_updates.subscribe(city, refresh=get_weather_from_cache)
+    except REDIS_ERRORS as error:
+        cache.report_failure(error)
+        return HttpResponse(status=204)
+
+    async def events():
+        sent = {}
+        try:
+            yield 'retry: 10000\n\n'
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), settings.LIVE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError: # Comment line keeps proxies from closing idle connection
+                    yield ': keepalive\n\n'
+                    continue
+
+                current = extract_current(update['current'], lang)
+                delta = {field: value for field, value in current.items() if sent.get(field) != value} # Only changed fields
+                sent = current
+                if delta:
+                    yield f'event: current\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n'
+        finally: # Client disconnected
+            await live_updates.unsubscribe(city, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Nginx must pass events through at once
+    return response
 
 
 @ratelimit(key='ip', rate='10/m')
@@ -419,6 +723,39 @@ def create_favorites(request): # Function to add city to favorites
     return redirect('index_url')
 
 
+@login_required(login_url='/', redirect_field_name=None)
+@ratelimit(key='ip', rate='10/m')
+def toggle_forecast_digest(request): # Subscribe to morning email with forecast for favorite cities or unsubscribe
+    if request.method == 'POST':
+        request.user.forecast_digest = not request.user.forecast_digest
+        request.user.forecast_digest_language = get_request_lang(request) # Digest is written in the language user reads the site in
+        request.user.save(update_fields=['forecast_digest', 'forecast_digest_language'])
+    return redirect('index_url')
+
+
+@login_required(login_url='/', redirect_field_name=None)
+@ratelimit(key='ip', rate='20/m')
+def create_alert(request, favorite_id): # Add threshold alert to user's favorite city, checked by evaluate_weather_alerts command
+    favorite = get_object_or_404(FavoriteLocation, id=favorite_id, user=request.user)
+    if request.method == 'POST':
+        form = WeatherAlertForm(request.POST)
+        if form.is_valid():
+            form.instance.favorite = favorite
+            form.save()
+        else:
+            for error in form.errors.get('__all__', []):
+                messages.error(request, error, extra_tags=ALERT_MESSAGE_TAG)
+    return redirect('index_url')
+
+
+@login_required(login_url='/', redirect_field_name=None)
+@ratelimit(key='ip', rate='20/m')
+def delete_alert(request, alert_id):
+    if request.method == 'POST':
+        WeatherAlert.objects.filter(id=alert_id, favorite__user=request.user).delete()
+    return redirect('index_url')
+
+
 @ratelimit(key='ip', rate='20/m')
 def show_favorites(request): # Function to show user's favorite cities
     city = request.GET.get('city') # Get value from input in index.html
@@ -434,7 +771,7 @@ def show_history(request):
 
 
 def incorrect_city(request, city): # Function to show notification that specified city was not found
-    context = {'city': city}
+    context = {'city': city, 'suggestions': get_city_index().similar(city)} # "Did you mean" from local index, without weather API
 
     if request.user.is_authenticated:
         favorites = FavoriteLocation.objects.filter(user=request.user)
@@ -443,6 +780,7 @@ def incorrect_city(request, city): # Function to show notification that specifie
     return render(request, 'incorrect_city.html', context=context)
 
 def redirect_too_many_requests(request, exception):
+    RATELIMIT_REJECTIONS.labels(request.resolver_match.url_name if request.resolver_match else 'unknown').inc()
     response = render(request, 'too_many_requests.html')
     response.status_code = 429
     return response
@@ -0,0 +1,117 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .autocomplete import get_city_index, remember_city
+from .geohash import encode_geohash
+from .history import record_forecast
+from .live import publish_update
+from .metrics import CACHE_REQUESTS, GEOHASH_SHARED_HITS, span
+from .providers import CityNotFound, ProviderError, ProviderTimeout, get_provider
+from .redis_batch import RedisBatch
+from .unknown_cities import unknown_cities
+
+WEATHER_CACHE_TIMEOUT = 60 # Weather data updates every minute
+GEOHASH_ALIAS_TIMEOUT = 24 * 3600 # City coordinates don't change, so city -> geohash cell is kept long
+
+
+@span('get_weather_data')
+def get_weather_data(city): # Get weather data from configured providers, see providers.py
+    try: # Always the longest horizon, so one cache entry serves every request
+        return get_provider().get_forecast(city, settings.FORECAST_MAX_DAYS, settings.WEATHER_PROVIDER_TIMEOUT)
+    except CityNotFound: # User entered invalid city
+        return {'error_type': 'City_not_found', 'city': city}
+    except ProviderTimeout:
+        return {'error_type': 'API_timeout'}
+    except ProviderError as e: # Any other error is considered API error
+        return {'error_type': 'API_error', 'message': str(e)}
+
+
+def write_now(store): # RedisBatch sends writes with the response, weather goes at once: concurrent misses of the city find it sooner
+    if isinstance(store, RedisBatch):
+        store.flush()
+
+
+def create_and_get_weather_from_cache(city, store=cache): # Get weather data, create cache, return weather data. Store is cache or request's RedisBatch
+    weather_data = get_weather_data(city)
+
+    if 'error_type' in weather_data: # If response contains error
+        error_type = weather_data['error_type'] # Store error type
+
+        if error_type == 'City_not_found': # Bloom filter has fixed size, cache key per wrong query would grow without limit
+            unknown_cities.add(city)
+            return 'City_not_found'
+
+        elif error_type in ['API_timeout', 'API_error']:
+            store.set(city, error_type, 300)
+            write_now(store)
+
+        return store.get(city)
+
+    weather_data['cached_at'] = int(time.time()) # Remember when data was cached, so responses know how long it stays fresh
+    if settings.WEATHER_GEOHASH_PRECISION: # Store under geohash cell of the city, so nearby cities can use it too
+        location = weather_data['location']
+        geohash = encode_geohash(location['lat'], location['lon'], settings.WEATHER_GEOHASH_PRECISION)
+        store.set(f'geohash:{geohash}', weather_data, WEATHER_CACHE_TIMEOUT)
+        store.set(f'geohash_alias:{city}', {
+            'geohash': geohash,
+            'location': {field: location[field] for field in ['name', 'region', 'country', 'lat', 'lon']},
+        }, GEOHASH_ALIAS_TIMEOUT)
+    else:
+        store.set(city, weather_data, WEATHER_CACHE_TIMEOUT) # Store cache for 60 seconds because data updates every minute
+    write_now(store)
+    publish_update(city, weather_data) # Open pages rendered from this cache entry get new current weather without reload
+
+    with span('history'): # Only on cache miss, so at most once a minute per city
+        record_forecast(weather_data)
+    remember_city(weather_data['location']['name'], weather_data['location']['country'])
+    return weather_data
+
+
+def is_known_unknown_city(city): # Weather API already didn't find this query. Known cities are never blocked by false positive of the filter
+    if get_city_index().contains_name(city):
+        return False
+
+    with span('redis'):
+        unknown = city in unknown_cities
+    CACHE_REQUESTS.labels('unknown_cities', 'hit' if unknown else 'miss').inc()
+    return unknown
+
+
+def get_weather_cache_keys(city): # Keys get_cached_weather() reads first, index fetches them together with ratelimit counter
+    if not settings.WEATHER_GEOHASH_PRECISION:
+        return [city]
+    return [city, f'geohash_alias:{city}']
+
+
+def get_cached_weather(city, store=cache): # Weather data or error cached for city, None if there is nothing
+    if not settings.WEATHER_GEOHASH_PRECISION:
+        return store.get(city)
+
+    alias_key = f'geohash_alias:{city}'
+    cached = store.get_many(get_weather_cache_keys(city)) # Errors are still cached under city name
+    if city in cached or alias_key not in cached:
+        return cached.get(city)
+
+    alias = cached[alias_key]
+    weather_data = store.get(f'geohash:{alias["geohash"]}')
+    if weather_data is not None and weather_data['location']['name'] != alias['location']['name']: # Fetched for another city in the cell
+        GEOHASH_SHARED_HITS.inc()
+        weather_data = dict(weather_data, location=dict(weather_data['location'], **alias['location'])) # Page still shows requested city
+    return weather_data
+
+
+def get_weather_from_cache(city, store=cache): # Get weather data from cache
+
+    with span('redis'):
+        weather_data = get_cached_weather(city, store)
+    CACHE_REQUESTS.labels('redis', 'miss' if weather_data is None else 'hit').inc()
+
+    if weather_data:
+        return weather_data
+
+    if weather_data is None: # if no data, use another function
+        if is_known_unknown_city(city):
+            return 'City_not_found'
+        return create_and_get_weather_from_cache(city, store)